@@ -1,8 +1,19 @@
 # app.py
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import yt_dlp
 import logging
+import time
+
+import json_provider
+import metrics
+import resolver
+import timing
+from batch import BATCH_MAX_URLS, BATCH_PARALLELISM, resolve_many
+from jobs import JOBS_MAX_URLS, JobQueue, JobStore, QueueFullError
+from responses import CLIENT_MAX_AGE, ResponseCache, compress, etag, negotiate
+from shared_cache import SHARED_CACHE_PATH
+from short_urls import parse_token, shorten
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -10,102 +21,292 @@ logging.basicConfig(level=logging.INFO)
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app) # Enable CORS for all routes
+json_provider.install(app) # orjson unless JSON_PROVIDER=default
+
+# Serialized, compressed get_video_info bodies of cached payloads
+response_cache = ResponseCache()
+
+def describe_error(e):
+    """
+    Maps an extraction exception to the (body, status) returned to the client.
+    """
+    if isinstance(e, yt_dlp.utils.DownloadError):
+        # Return the actual error message from yt-dlp to the frontend
+        error_message = str(e).replace('ERROR: ', '') # Clean up the message a bit
+        return {"error": "error_fetch_failed", "message": error_message}, 400
+    return {"error": "error_server_error", "message": "An internal server error occurred."}, 500
+
+def error_response(video_url, e):
+    """
+    Logs an extraction failure and returns its (body, status).
+    """
+    body, status = describe_error(e)
+    if body["error"] == "error_fetch_failed":
+        logging.error(f"yt-dlp download error for URL {video_url}: {body['message']}")
+    else:
+        logging.error(f"An unexpected error occurred for URL {video_url}: {e}")
+    return body, status
+
+def url_result(url, outcome, value):
+    """
+    Per-URL entry used by the job and batch endpoints.
+    """
+    if outcome == 'done':
+        return {"url": url, "status": "done", "result": value}
+    error_body, _ = describe_error(value)
+    return {"url": url, "status": "failed", **error_body}
 
-@app.route('/api/get_video_info', methods=['POST'])
+# Slow extractions submitted through /api/jobs run here, off the request threads;
+# their results are kept in the shared cache file so any worker can answer a poll
+job_queue = JobQueue(resolver.resolve_video_info, url_result,
+                     store=JobStore(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None)
+
+def rendered_response(cache_key, version, variant, payload):
+    """
+    Returns the get_video_info response for a payload, with a weak ETag. For
+    a cached payload (version is not None) the serialized and compressed body
+    and its ETag are reused from an earlier request for the same entry,
+    variant and encoding. A GET whose If-None-Match matches gets a 304.
+    """
+    encoding = negotiate(request.headers.get('Accept-Encoding'))
+    key = (cache_key, variant, encoding)
+    rendered = response_cache.get(key, version) if version is not None else None
+    if version is not None:
+        metrics.RESPONSE_CACHE.labels('hit' if rendered is not None else 'miss').inc()
+    if rendered is None:
+        body = json_provider.dump_bytes(app, payload)
+        rendered = (*compress(body, encoding), etag(body))
+        if version is not None:
+            response_cache.put(key, version, *rendered)
+    used, body, tag = rendered
+
+    if request.method in ('GET', 'HEAD') and request.if_none_match.contains_weak(tag):
+        metrics.NOT_MODIFIED.inc()
+        resp = app.response_class(status=304)
+    else:
+        resp = app.response_class(body, mimetype='application/json')
+        if used is not None:
+            resp.headers['Content-Encoding'] = used
+    resp.set_etag(tag, weak=True)
+    resp.vary.add('Accept-Encoding')
+    if request.method in ('GET', 'HEAD'):
+        if version is not None:
+            resp.cache_control.public = True
+            resp.cache_control.max_age = max(0, min(int(version - time.time()), CLIENT_MAX_AGE))
+        else:
+            resp.cache_control.no_cache = True
+    return resp
+
+def requested_urls(data):
+    """
+    Returns the de-duplicated list of URLs from a "url" or "urls" payload,
+    or None if there is none.
+    """
+    if not isinstance(data, dict):
+        return None
+    urls = data.get('urls')
+    if urls is None and data.get('url'):
+        urls = [data['url']]
+    if not isinstance(urls, list) or not urls or not all(isinstance(u, str) and u for u in urls):
+        return None
+    return list(dict.fromkeys(urls))
+
+def query_flag(name):
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+@app.route('/api/get_video_info', methods=['GET', 'POST'])
 def get_video_info():
     """
     API endpoint to fetch video information using yt-dlp.
-    Accepts a JSON payload with a "url" key.
+    Accepts a JSON payload with a "url" key, and optional flags: "debug" adds
+    a per-stage latency breakdown to the response, "short_urls" returns a
+    short "token" per format instead of its direct "url" (see /r/<token>)
+    when the payload is cached under a recognised extractor's video id, and
+    the direct URLs otherwise.
+
+    GET takes the same as query parameters (?url=...&short_urls=1) and is
+    cacheable; responses carry an ETag, and a GET with a matching
+    If-None-Match gets 304 Not Modified.
     """
-    data = request.get_json()
-    if not data or 'url' not in data:
-        return jsonify({"error": "error_invalid_url", "message": "URL is missing."}), 400
+    with metrics.REQUESTS_IN_FLIGHT.track_inprogress(), metrics.REQUEST_SECONDS.time():
+        started = time.perf_counter()
+        if request.method == 'POST':
+            data = request.get_json()
+        else:
+            data = {'url': request.args['url']} if request.args.get('url') else None
+            if data:
+                data['debug'] = query_flag('debug')
+                data['short_urls'] = query_flag('short_urls')
+        parsed = time.perf_counter()
+        if not data or 'url' not in data:
+            metrics.REQUESTS.labels('error_invalid_url').inc()
+            return jsonify({"error": "error_invalid_url", "message": "URL is missing."}), 400
+
+        video_url = data['url']
+        logging.info(f"Received request for URL: {video_url}")
+
+        debug = data.get('debug') is True
+        timer = token = None
+        if timing.SERVER_TIMING or debug:
+            timer, token = timing.start()
+            timer.add('parse', parsed - started)
+        version = None
+        try:
+            try:
+                response, version = resolver.resolve_versioned(video_url)
+
+                logging.info(f"Successfully processed URL: {video_url}. Found {len(response['formats'])} unique formats.")
+                metrics.REQUESTS.labels('success').inc()
+                # A payload that was not cached has nothing for a token to point at, and
+                # tokens for URL-keyed payloads would carry the whole page URL
+                canonical_id = resolver.canonicalize(video_url)[1]
+                short_urls = data.get('short_urls') is True and version is not None and canonical_id is not None
+                if short_urls:
+                    response = shorten(response, canonical_id)
+                status = 200
 
-    video_url = data['url']
-    logging.info(f"Received request for URL: {video_url}")
-
-    # More robust yt-dlp options to increase success rate
-    ydl_opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-        'noplaylist': True,
-        'ignoreerrors': True,  # Ignore errors on individual videos
-        'geo_bypass': True,  # Attempt to bypass geographic restrictions
-        'nocheckcertificate': True,  # Suppress SSL certificate verification
-        'source_address': '0.0.0.0'  # Force IPv4, which can sometimes help
-    }
+            except Exception as e:
+                response, status = error_response(video_url, e)
+                metrics.REQUESTS.labels(response['error']).inc()
+
+            with timing.stage('serialize'):
+                if status == 200 and not debug:
+                    variant = 'short' if short_urls else 'full'
+                    resp = rendered_response(resolver.canonicalize(video_url)[0], version, variant, response)
+                elif status == 200:
+                    body = json_provider.dump_bytes(app, response).rstrip()
+                else:
+                    resp = jsonify(response)
+                    resp.status_code = status
+            if status == 200 and debug:
+                # Added after serializing the payload, so the breakdown includes that stage
+                debug_body = json_provider.dump_bytes(app, timer.breakdown())
+                resp = app.response_class(body[:-1] + b',"debug":' + debug_body + b'}', mimetype='application/json')
+        finally:
+            if token is not None:
+                timing.stop(token)
+
+        if timer is not None and timing.SERVER_TIMING:
+            resp.headers['Server-Timing'] = timer.header()
+            resp.headers['Timing-Allow-Origin'] = '*'
+        return resp
+
+@app.route('/r/<token>', methods=['GET'])
+def redirect_format(token):
+    """
+    Redirects to the direct URL behind a token from a "short_urls" response.
+    Answers 410 once the video has dropped out of the cache; fetch its info again.
+    """
+    parsed = parse_token(token)
+    if parsed is None:
+        metrics.REDIRECTS.labels('invalid').inc()
+        return jsonify({"error": "error_invalid_token", "message": "Malformed token."}), 400
+    url = resolver.resolve_format_url(*parsed)
+    if url is None:
+        metrics.REDIRECTS.labels('gone').inc()
+        return jsonify({"error": "error_expired", "message": "This link has expired, request the video info again."}), 410
+    metrics.REDIRECTS.labels('redirected').inc()
+    # The target expires, so neither clients nor proxies should keep the redirect
+    return '', 302, {'Location': url, 'Cache-Control': 'no-store'}
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queues one or more URLs for background extraction.
+    Accepts a JSON payload with a "url" or "urls" key and returns the job id
+    right away; poll GET /api/jobs/<id> for the result.
+    """
+    urls = requested_urls(request.get_json(silent=True))
+    if urls is None:
+        return jsonify({"error": "error_invalid_url", "message": "URL is missing."}), 400
+    if len(urls) > JOBS_MAX_URLS:
+        return jsonify({"error": "error_invalid_url", "message": f"At most {JOBS_MAX_URLS} URLs per job."}), 400
 
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Extract video information
-            info_dict = ydl.extract_info(video_url, download=False)
-            
-            # Check if info was actually extracted
-            if not info_dict:
-                raise yt_dlp.utils.DownloadError("Failed to extract video information.")
-
-            title = info_dict.get('title', 'No title')
-            thumbnail = info_dict.get('thumbnail', '')
-            
-            formats = []
-            
-            # Check if any formats are available
-            if not info_dict.get('formats'):
-                 raise yt_dlp.utils.DownloadError("No downloadable formats found for this video.")
-
-            # Collect and filter formats
-            for f in info_dict.get('formats', []):
-                # We only want formats with a direct URL that we can send to the client
-                if f.get('url') and (f.get('vcodec') != 'none' or f.get('acodec') != 'none'):
-                    file_size = f.get('filesize') or f.get('filesize_approx')
-                    
-                    # Create a quality label
-                    quality_label = f.get('format_note')
-                    if not quality_label:
-                        if f.get('height'):
-                            quality_label = f"{f.get('height')}p"
-                        elif f.get('vcodec') == 'none':
-                            quality_label = f"Audio ({f.get('abr')}k)"
-                        else:
-                            quality_label = "Unknown"
-
-                    formats.append({
-                        'ext': f.get('ext'),
-                        'quality': quality_label,
-                        'size': file_size,
-                        'url': f.get('url'),
-                    })
-            
-            # Raise error if no valid formats were found
-            if not formats:
-                raise yt_dlp.utils.DownloadError("Could not find any valid formats with direct URLs.")
-
-            # Simple deduplication based on quality label to avoid clutter
-            unique_formats = []
-            seen_qualities = set()
-            for f in sorted(formats, key=lambda x: x.get('size') or 0, reverse=True):
-                if f['quality'] not in seen_qualities:
-                    unique_formats.append(f)
-                    seen_qualities.add(f['quality'])
-
-            response = {
-                'title': title,
-                'thumbnail': thumbnail,
-                'formats': unique_formats,
-            }
-            
-            logging.info(f"Successfully processed URL: {video_url}. Found {len(unique_formats)} unique formats.")
-            return jsonify(response)
-
-    except yt_dlp.utils.DownloadError as e:
-        # Return the actual error message from yt-dlp to the frontend
-        error_message = str(e).replace('ERROR: ', '') # Clean up the message a bit
-        logging.error(f"yt-dlp download error for URL {video_url}: {error_message}")
-        return jsonify({"error": "error_fetch_failed", "message": error_message}), 400
-    except Exception as e:
-        logging.error(f"An unexpected error occurred for URL {video_url}: {e}")
-        return jsonify({"error": "error_server_error", "message": "An internal server error occurred."}), 500
+        job = job_queue.submit(urls)
+    except QueueFullError as e:
+        return jsonify({"error": "error_busy", "message": str(e)}), 503
+
+    logging.info(f"Queued job {job.id} for {len(urls)} URL(s)")
+    poll_url = f"/api/jobs/{job.id}"
+    return jsonify({"id": job.id, "status": job.status, "poll": poll_url}), 202, {'Location': poll_url}
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Returns the status of a job and, once done, one result per URL: either
+    the get_video_info payload or the error it produced.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "error_job_not_found", "message": "Unknown or expired job."}), 404
+
+    body = {"id": job.id, "status": job.status}
+    if job.status == 'done':
+        body["results"] = [job.results[url] for url in job.urls]
+    return jsonify(body)
+
+@app.route('/api/get_video_info_batch', methods=['POST'])
+def get_video_info_batch():
+    """
+    Resolves many URLs in one request.
+    Accepts a JSON payload with a "urls" list and an optional "parallelism".
+    Duplicate URLs are resolved once. Results are streamed as NDJSON, one
+    line per URL, in the order they finish.
+    """
+    data = request.get_json(silent=True)
+    urls = requested_urls(data)
+    if urls is None:
+        return jsonify({"error": "error_invalid_url", "message": "URL is missing."}), 400
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({"error": "error_invalid_url", "message": f"At most {BATCH_MAX_URLS} URLs per batch."}), 400
+    parallelism = data.get('parallelism', BATCH_PARALLELISM)
+    if not isinstance(parallelism, int) or isinstance(parallelism, bool):
+        return jsonify({"error": "error_invalid_request", "message": "parallelism must be an integer."}), 400
+
+    logging.info(f"Received batch request for {len(urls)} URL(s)")
+
+    def generate():
+        for url, outcome, value in resolve_many(resolver.resolve_video_info, urls, parallelism):
+            if outcome == 'failed':
+                error_response(url, value)
+            yield json_provider.dump_bytes(app, url_result(url, outcome, value)) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.after_request
+def compress_response(resp):
+    """
+    Compresses other JSON responses with the best encoding the client accepts.
+    Streamed responses (the NDJSON batch) are left alone.
+    """
+    if (resp.is_streamed or resp.direct_passthrough or 'Content-Encoding' in resp.headers
+            or resp.mimetype != 'application/json'):
+        return resp
+    resp.vary.add('Accept-Encoding')
+    encoding, body = compress(resp.get_data(), negotiate(request.headers.get('Accept-Encoding')))
+    if encoding is not None:
+        resp.set_data(body)
+        resp.headers['Content-Encoding'] = encoding
+    return resp
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus metrics for the extraction path, aggregated over all workers.
+    """
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """
+    Cache and extraction coalescing counters for this worker.
+    """
+    stats = resolver.stats()
+    stats['jobs'] = job_queue.stats()
+    stats['responses'] = response_cache.stats()
+    return jsonify(stats)
 
 if __name__ == '__main__':
     # Render will use gunicorn to run the app. This section is for local testing.
@@ -0,0 +1,163 @@
+# backends.py
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import yt_dlp
+
+import extraction
+import timing
+from cassette import CassetteBackend
+
+# Which backend runs extract_info: "thread" (in the web worker), "process",
+# or "cassette" (recorded HTTP traffic, see cassette.py)
+EXTRACTION_BACKEND = os.environ.get('EXTRACTION_BACKEND', 'thread')
+# Number of long-lived extraction processes per web worker
+PROCESS_POOL_SIZE = int(os.environ.get('PROCESS_POOL_SIZE', str(os.cpu_count() or 2)))
+# Give up waiting for a single extraction after this many seconds
+PROCESS_TASK_TIMEOUT = float(os.environ.get('PROCESS_TASK_TIMEOUT', '60'))
+# Replace an extraction process after it has handled this many URLs
+PROCESS_MAX_TASKS_PER_CHILD = int(os.environ.get('PROCESS_MAX_TASKS_PER_CHILD', '200'))
+
+
+class ThreadBackend:
+    """
+    Runs extractions on the calling thread, inside the web worker.
+    """
+    name = 'thread'
+
+    def extract(self, video_url):
+        return extraction.extract_video_info(video_url)
+
+    def stats(self):
+        return {'name': self.name, 'ydl_pool': extraction.ydl_pool.stats()}
+
+
+def _init_worker():
+    # Build the YoutubeDL (and the extractor index, on import) before the first task arrives
+    with extraction.ydl_pool.acquire():
+        pass
+
+
+def _extract_in_worker(video_url):
+    """
+    Returns (payload, extractor key). The request's timer lives in the parent,
+    so the extractor noted here is handed back for the parent to record.
+    """
+    timer, token = timing.start()
+    # Exceptions travel back by pickle; yt-dlp's carry tracebacks, which do not pickle
+    try:
+        return extraction.extract_video_info(video_url), timer.notes.get('extractor')
+    except yt_dlp.utils.DownloadError as e:
+        raise yt_dlp.utils.DownloadError(str(e)) from None
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+    finally:
+        timing.stop(token)
+
+
+class ProcessBackend:
+    """
+    Runs extractions in a pool of long-lived worker processes so regex-heavy
+    page parsing and JS signature solving are not serialized on the GIL.
+    Each process keeps warm YoutubeDL state; only the trimmed payload built by
+    build_payload crosses back over IPC.
+
+    A task that exceeds PROCESS_TASK_TIMEOUT fails for the caller, but keeps
+    its process busy until yt-dlp's own socket timeouts end it.
+    """
+    name = 'process'
+
+    def __init__(self, workers=PROCESS_POOL_SIZE, timeout=PROCESS_TASK_TIMEOUT,
+                 max_tasks_per_child=PROCESS_MAX_TASKS_PER_CHILD):
+        self._workers = workers
+        self._timeout = timeout
+        self._max_tasks_per_child = max_tasks_per_child
+        self._executor = None
+        self._lock = threading.Lock()
+        self.timeouts = 0
+        self.crashes = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # max_tasks_per_child needs a start method other than fork
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    max_tasks_per_child=self._max_tasks_per_child,
+                )
+            return self._executor
+
+    def _reset_executor(self, broken):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def extract(self, video_url):
+        executor = self._get_executor()
+        try:
+            # Covers extract_info, post-processing and IPC, which all happen in the child
+            with timing.stage('extract'):
+                future = executor.submit(_extract_in_worker, video_url)
+                payload, extractor = future.result(timeout=self._timeout)
+        except TimeoutError:
+            self.timeouts += 1
+            future.cancel()
+            raise yt_dlp.utils.DownloadError(f"Extraction timed out after {self._timeout:.0f}s.") from None
+        except BrokenProcessPool:
+            self.crashes += 1
+            logging.error(f"Extraction process died while handling URL {video_url}, restarting the pool")
+            self._reset_executor(executor)
+            raise RuntimeError("Extraction process died.") from None
+        if extractor is not None:
+            timing.note('extractor', extractor)
+        return payload
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'workers': self._workers,
+            'max_tasks_per_child': self._max_tasks_per_child,
+            'timeouts': self.timeouts,
+            'crashes': self.crashes,
+        }
+
+
+BACKENDS = {
+    ThreadBackend.name: ThreadBackend,
+    ProcessBackend.name: ProcessBackend,
+    CassetteBackend.name: CassetteBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Returns the configured extraction backend, creating it on first use.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if EXTRACTION_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown EXTRACTION_BACKEND {EXTRACTION_BACKEND!r}, "
+                                 f"expected one of {', '.join(BACKENDS)}")
+            _backend = BACKENDS[EXTRACTION_BACKEND]()
+            logging.info(f"Using the {_backend.name} extraction backend")
+        return _backend
+
+
+def set_backend(backend):
+    """
+    Replaces the extraction backend, e.g. with a stub for offline benchmarks.
+    """
+    global _backend
+    with _backend_lock:
+        _backend = backend
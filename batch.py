@@ -0,0 +1,46 @@
+# batch.py
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Extraction threads shared by all batch requests in a worker process
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', '16'))
+# Default and maximum number of URLs one batch request resolves at a time
+BATCH_PARALLELISM = int(os.environ.get('BATCH_PARALLELISM', '4'))
+BATCH_MAX_PARALLELISM = int(os.environ.get('BATCH_MAX_PARALLELISM', '8'))
+# Maximum number of URLs in one batch request
+BATCH_MAX_URLS = int(os.environ.get('BATCH_MAX_URLS', '500'))
+
+_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+
+def resolve_many(resolve, urls, parallelism=BATCH_PARALLELISM):
+    """
+    Resolves URLs concurrently, at most `parallelism` at a time, and yields
+    (url, outcome, value) in completion order: ('done', payload) on success,
+    ('failed', exception) otherwise. Closing the generator early cancels the
+    URLs that have not started yet.
+    """
+    parallelism = max(1, min(parallelism, BATCH_MAX_PARALLELISM))
+    remaining = iter(urls)
+    pending = {}
+
+    def submit_next():
+        url = next(remaining, None)
+        if url is not None:
+            pending[_executor.submit(resolve, url)] = url
+
+    for _ in range(parallelism):
+        submit_next()
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                submit_next()
+                try:
+                    yield url, 'done', future.result()
+                except Exception as e:
+                    yield url, 'failed', e
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,65 @@
+# benchmarks/bench_cache_memory.py
+"""
+Measures the memory held by cached get_video_info payloads, per 10k cached
+videos, as plain dicts (how the in-process cache used to keep them) and as
+the compact records it keeps now. Payloads come from the deterministic stub
+backend and are decoded from JSON first, as they are when promoted from the
+shared tier, so no two payloads share strings by accident.
+
+Usage: python benchmarks/bench_cache_memory.py [--videos 10000] [--formats 30]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from compact import pack  # noqa: E402
+from extraction import build_payload  # noqa: E402
+from stub_backend import make_info_dict  # noqa: E402
+from tinylfu import estimate_size  # noqa: E402
+
+
+def measure(encoded, convert):
+    """
+    Returns (traced bytes, estimated bytes) held by [convert(payload)] for all payloads.
+    """
+    gc.collect()
+    tracemalloc.start()
+    held = [convert(json.loads(data)) for data in encoded]
+    gc.collect()
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return traced, sum(estimate_size(value) for value in held)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', type=int, default=10000)
+    parser.add_argument('--formats', type=int, default=30, help='formats per extracted video')
+    args = parser.parse_args()
+
+    encoded = []
+    for i in range(args.videos):
+        payload = build_payload(make_info_dict(args.formats, video_id=f'v{i:010d}', seed=i))
+        payload['canonical_id'] = f'Youtube:v{i:010d}'
+        encoded.append(json.dumps(payload).encode('utf-8'))
+    url_bytes = sum(len(f['url']) for f in json.loads(encoded[0])['formats'])
+    print(f"{args.videos} videos, {len(json.loads(encoded[0])['formats'])} formats each after dedup, "
+          f"{url_bytes / 1024:.1f} KiB of URLs per video")
+
+    scale = 10000 / args.videos
+    results = {}
+    for name, convert in (('dict', lambda payload: payload), ('compact', pack)):
+        traced, estimated = measure(encoded, convert)
+        results[name] = traced
+        print(f"{name:>8}: {traced * scale / 2 ** 20:8.1f} MiB per 10k videos "
+              f"(cache budget estimate {estimated * scale / 2 ** 20:.1f} MiB)")
+    print(f"   saved: {(1 - results['compact'] / results['dict']) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
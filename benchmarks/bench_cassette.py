@@ -0,0 +1,73 @@
+# benchmarks/bench_cassette.py
+"""
+Benchmarks /api/get_video_info end to end with the real yt-dlp extractors,
+replaying HTTP traffic recorded by the cassette backend, so no network is
+needed. Record the cassettes once (with network access):
+
+    python benchmarks/bench_cassette.py --record URL [URL ...]
+
+then replay them as often as needed:
+
+    python benchmarks/bench_cassette.py --rounds 20 --profile replay.prof URL [URL ...]
+
+Every round clears the result cache, so each request runs a full extraction.
+"""
+import argparse
+import cProfile
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# Keep the benchmark away from the shared cache of a server running on this host
+os.environ.setdefault('SHARED_CACHE_PATH', os.path.join(tempfile.mkdtemp(), 'video_info_cache.sqlite3'))
+os.environ.setdefault('CACHE_SNAPSHOT_PATH', '')
+
+import app as app_module  # noqa: E402
+import backends  # noqa: E402
+import resolver  # noqa: E402
+from cassette import CASSETTE_DIR, CassetteBackend  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('urls', nargs='+')
+    parser.add_argument('--dir', default=CASSETTE_DIR, help='cassette directory')
+    parser.add_argument('--record', action='store_true', help='record cassettes instead of replaying them')
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--profile', help='write cProfile stats of the replay rounds to this file')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    backends.set_backend(CassetteBackend(mode='record' if args.record else 'replay', directory=args.dir))
+    client = app_module.app.test_client()
+
+    rounds = 1 if args.record else args.rounds
+    profiler = cProfile.Profile() if args.profile else None
+    latencies = {url: [] for url in args.urls}
+    for _ in range(rounds):
+        resolver.video_cache.clear()
+        for url in args.urls:
+            if profiler:
+                profiler.enable()
+            started = time.perf_counter()
+            r = client.post('/api/get_video_info', json={'url': url})
+            latencies[url].append(time.perf_counter() - started)
+            if profiler:
+                profiler.disable()
+            if r.status_code != 200:
+                print(f"{url}: HTTP {r.status_code} {r.get_json()}")
+
+    for url, samples in latencies.items():
+        samples.sort()
+        print(f"{url}\n    min={samples[0] * 1000:.1f}ms  median={samples[len(samples) // 2] * 1000:.1f}ms  "
+              f"max={samples[-1] * 1000:.1f}ms  ({len(samples)} runs)")
+    if profiler:
+        profiler.dump_stats(args.profile)
+        print(f"Wrote {args.profile}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_codec.py
+"""
+Compares the ways a cache entry can be stored: JSON (the old shared-cache
+format), msgpack, msgpack + zstd, and msgpack + zstd with a dictionary
+trained on other entries. Reports bytes per entry, compression ratio
+against JSON, and encode/decode time per entry, for each zstd level given.
+
+Usage: python benchmarks/bench_codec.py [--entries 1000] [--formats 30] [--levels 1,3,9]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import msgpack  # noqa: E402
+
+from codec import CODEC_TRAIN_SAMPLES, PayloadCodec  # noqa: E402
+from extraction import build_payload  # noqa: E402
+from stub_backend import make_info_dict  # noqa: E402
+
+
+def timed(fn, values):
+    started = time.perf_counter()
+    results = [fn(value) for value in values]
+    return results, (time.perf_counter() - started) / len(values)
+
+
+def report(name, encoded, encode_seconds, decode_seconds, json_bytes):
+    size = sum(len(data) for data in encoded) / len(encoded)
+    print(f"{name:>22}: {size:8.0f} B/entry  ratio {json_bytes / size:5.2f}  "
+          f"encode {encode_seconds * 1e6:7.1f}us  decode {decode_seconds * 1e6:7.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=1000)
+    parser.add_argument('--formats', type=int, default=30, help='formats per extracted video')
+    parser.add_argument('--levels', default='1,3,9', help='zstd levels to try')
+    args = parser.parse_args()
+
+    # Train on one set of videos and measure on another, as in production
+    def payloads(offset, count):
+        return [build_payload(make_info_dict(args.formats, video_id=f'v{i:010d}', seed=i))
+                for i in range(offset, offset + count)]
+    training = payloads(0, CODEC_TRAIN_SAMPLES)
+    entries = payloads(CODEC_TRAIN_SAMPLES, args.entries)
+
+    encoded, encode_seconds = timed(lambda p: json.dumps(p, separators=(',', ':')).encode('utf-8'), entries)
+    _, decode_seconds = timed(json.loads, encoded)
+    json_bytes = sum(len(data) for data in encoded) / len(encoded)
+    report('json', encoded, encode_seconds, decode_seconds, json_bytes)
+
+    codec = PayloadCodec(train_samples=0)
+    encoded, encode_seconds = timed(codec.pack, entries)
+    _, decode_seconds = timed(lambda data: msgpack.unpackb(data, raw=False), encoded)
+    report('msgpack', encoded, encode_seconds, decode_seconds, json_bytes)
+
+    for level in (int(level) for level in args.levels.split(',')):
+        codec = PayloadCodec(level=level, train_samples=0)
+        encoded, encode_seconds = timed(codec.encode, entries)
+        _, decode_seconds = timed(codec.decode, encoded)
+        report(f'msgpack+zstd-{level}', encoded, encode_seconds, decode_seconds, json_bytes)
+
+        codec.train([codec.pack(payload) for payload in training])
+        encoded, encode_seconds = timed(codec.encode, entries)
+        _, decode_seconds = timed(codec.decode, encoded)
+        report(f'msgpack+zstd-{level}+dict', encoded, encode_seconds, decode_seconds, json_bytes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_extractor_dispatch.py
+"""
+Compares the cost of choosing an extractor for a URL: yt-dlp's linear
+suitable() scan versus the hostname index in extractor_index.py. Also
+reports how often the index picks the same extractor as the full scan.
+
+Usage: python benchmarks/bench_extractor_dispatch.py [rounds]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from extractor_index import ExtractorIndex  # noqa: E402
+
+# URL shapes as they show up in our request logs; {id} is replaced by a fresh
+# number for every URL timed, since real traffic rarely repeats a video id
+CORPUS = [
+    'https://www.youtube.com/watch?v={id:011d}',
+    'https://youtube.com/watch?v={id:011d}&t=30',
+    'https://m.youtube.com/watch?v={id:011d}&feature=share',
+    'https://youtu.be/{id:011d}',
+    'https://youtu.be/{id:011d}?si=AbCdEfGh',
+    'https://www.youtube.com/shorts/{id:011d}',
+    'https://music.youtube.com/watch?v={id:011d}',
+    'https://www.youtube.com/embed/{id:011d}',
+    'https://www.youtube.com/live/{id:011d}',
+    'https://www.youtube.com/playlist?list=PL{id:016d}',
+    'https://www.youtube.com/watch?v={id:011d}&list=PLBCF2DAC6FFB574DE&index=2',
+    'https://www.tiktok.com/@scout2015/video/{id:019d}',
+    'https://vm.tiktok.com/ZM{id:07d}/',
+    'https://www.instagram.com/p/C{id:010d}/',
+    'https://www.instagram.com/reel/C{id:010d}/',
+    'https://www.facebook.com/watch/?v={id:017d}',
+    'https://fb.watch/{id:09d}/',
+    'https://twitter.com/elonmusk/status/{id:019d}',
+    'https://x.com/elonmusk/status/{id:019d}',
+    'https://vimeo.com/{id:08d}',
+    'https://player.vimeo.com/video/{id:08d}',
+    'https://www.dailymotion.com/video/x{id:07d}',
+    'https://dai.ly/x{id:07d}',
+    'https://soundcloud.com/forss/track-{id}',
+    'https://www.reddit.com/r/videos/comments/{id:06d}/that_small_heart_attack/',
+    'https://www.twitch.tv/videos/{id:08d}',
+    'https://clips.twitch.tv/FaintLightGull{id}',
+    'https://www.bilibili.com/video/BV{id:010d}',
+    'https://www.bbc.co.uk/iplayer/episode/b{id:07d}',
+    'https://streamable.com/d{id}',
+    'https://example.com/files/video{id}.mp4',
+]
+
+
+def fresh_urls(rounds, first_id):
+    return [template.format(id=first_id + i) for i in range(rounds) for template in CORPUS]
+
+
+def timed(fn, urls):
+    start = time.perf_counter()
+    for url in urls:
+        fn(url)
+    return (time.perf_counter() - start) / len(urls)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    start = time.perf_counter()
+    index = ExtractorIndex()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # Compile every extractor regex once so neither side pays for it below
+    sample = fresh_urls(1, 1)
+    for url in sample:
+        index._full_scan(url)
+
+    agree = sum(index._indexed_match(url) == index._full_scan(url) for url in sample)
+    candidates = sum(len(index.candidates(url)) for url in sample) / len(sample)
+
+    full = timed(index._full_scan, fresh_urls(rounds, 1000))
+    indexed = timed(index._indexed_match, fresh_urls(rounds, 2000))
+    dispatched = timed(index.match, fresh_urls(rounds, 3000))
+
+    print(f"index build:                  {build_ms:.1f}ms")
+    print(f"extractors (full scan):       {len(index._classes)}")
+    print(f"candidates per URL (index):   {candidates:.0f}")
+    print(f"index agrees with full scan:  {agree}/{len(sample)}")
+    print(f"full suitable() scan:         {full * 1e6:.1f}us/url")
+    print(f"indexed candidates only:      {indexed * 1e6:.1f}us/url")
+    print(f"ExtractorIndex.match():       {dispatched * 1e6:.1f}us/url")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+# benchmarks/bench_request_path.py
+"""
+Offline benchmark of the full Flask request path of /api/get_video_info,
+with extraction replaced by the deterministic stub backend.
+
+For every (format count, concurrency) combination it fires --requests POSTs
+through the Flask test client from --concurrency threads and records
+throughput and p50/p90/p99 latency. Results are written as JSON so runs on
+different commits can be compared.
+
+By default every request uses a distinct video id, so each one misses the
+cache and goes through extraction post-processing; --distinct-videos N
+reuses N ids to measure the cache-hit path instead.
+
+Usage:
+    python benchmarks/bench_request_path.py --formats 10,100,2000 --concurrency 1,8,32 \
+        --requests 2000 --output bench_output.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# Keep the benchmark away from the shared cache of a server running on this host
+os.environ.setdefault('SHARED_CACHE_PATH', os.path.join(tempfile.mkdtemp(), 'video_info_cache.sqlite3'))
+os.environ.setdefault('CACHE_SNAPSHOT_PATH', '')
+
+import app as app_module  # noqa: E402
+import backends  # noqa: E402
+import resolver  # noqa: E402
+from stub_backend import StubBackend, load_info_dict, make_info_dict  # noqa: E402
+
+
+def percentile(sorted_samples, fraction):
+    index = min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))
+    return sorted_samples[index]
+
+
+def run_once(requests, concurrency, distinct_videos, prefix='bench'):
+    client = app_module.app.test_client()
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal errors
+        local = []
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            video = i % distinct_videos if distinct_videos else i
+            started = time.perf_counter()
+            # Eleven characters, like a real YouTube id; longer ones are truncated and collide
+            video_id = f"{prefix[:4]}{video:07d}"
+            r = client.post('/api/get_video_info', json={'url': f"https://www.youtube.com/watch?v={video_id}"})
+            local.append(time.perf_counter() - started)
+            if r.status_code != 200:
+                with lock:
+                    errors += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 4),
+        'throughput_rps': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--formats', default='10,100,500,2000', help='comma-separated format counts')
+    parser.add_argument('--fixture', help='recorded info_dict JSON to use instead of generated ones')
+    parser.add_argument('--concurrency', default='1,8,32', help='comma-separated client thread counts')
+    parser.add_argument('--requests', type=int, default=1000, help='requests per combination')
+    parser.add_argument('--distinct-videos', type=int, default=0,
+                        help='number of distinct video ids to cycle through (0: all distinct)')
+    parser.add_argument('--extract-ms', type=float, default=0.0, help='simulated extraction latency')
+    parser.add_argument('--warmup', type=int, default=50, help='untimed requests before each run')
+    parser.add_argument('--output', help='write JSON results to this file')
+    args = parser.parse_args()
+
+    # Per-request INFO logging would dominate the numbers and flood the terminal
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.fixture:
+        info_dicts = {f"fixture:{os.path.basename(args.fixture)}": load_info_dict(args.fixture)}
+    else:
+        info_dicts = {str(n): make_info_dict(n) for n in map(int, args.formats.split(','))}
+
+    runs = []
+    for formats, info_dict in info_dicts.items():
+        backend = StubBackend(info_dict, extract_delay=args.extract_ms / 1000)
+        backends.set_backend(backend)
+        for concurrency in map(int, args.concurrency.split(',')):
+            # Every run starts from an empty cache
+            resolver.video_cache.clear()
+            run_once(args.warmup, concurrency, args.distinct_videos, prefix='warm')
+            backend.calls = 0
+            result = run_once(args.requests, concurrency, args.distinct_videos)
+            result.update({'formats': formats, 'concurrency': concurrency, 'extractions': backend.calls})
+            if not args.distinct_videos:
+                assert backend.calls == args.requests, \
+                    f"expected one extraction per request, got {backend.calls} for {args.requests}"
+            runs.append(result)
+            print(f"formats={formats:>6} concurrency={concurrency:>3} "
+                  f"{result['throughput_rps']:>9.1f} req/s  p50={result['p50_ms']:.2f}ms  "
+                  f"p99={result['p99_ms']:.2f}ms  errors={result['errors']}")
+
+    if args.output:
+        report = {
+            'benchmark': 'request_path',
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'parameters': vars(args),
+            'runs': runs,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_ydl_pool.py
+"""
+Measures the per-request overhead of getting a ready-to-use YoutubeDL,
+with and without the warm instance pool. No network access is needed: each
+iteration does the setup work an extraction pays before its first request
+(option parsing, extractor instantiation, opener/cookie-jar creation).
+
+Usage: python benchmarks/bench_ydl_pool.py [iterations]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import yt_dlp  # noqa: E402
+
+from extraction import YDL_OPTS  # noqa: E402
+from ydl_pool import YoutubeDLPool  # noqa: E402
+
+
+def warm_up(ydl):
+    # What extract_info touches before it sends anything over the wire
+    ydl.get_info_extractor('Youtube')
+    ydl.cookiejar
+    ydl._request_director
+
+
+def fresh_instance():
+    with yt_dlp.YoutubeDL(dict(YDL_OPTS)) as ydl:
+        warm_up(ydl)
+
+
+def pooled_instance(pool):
+    with pool.acquire() as ydl:
+        warm_up(ydl)
+
+
+def measure(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        'mean_ms': statistics.mean(samples) * 1000,
+        'p50_ms': samples[len(samples) // 2] * 1000,
+        'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pool = YoutubeDLPool(YDL_OPTS, size=1, max_uses=iterations + 1)
+    # Build the pooled instance outside the measured loop, as a running worker would
+    pooled_instance(pool)
+
+    results = {
+        'fresh YoutubeDL per request': measure(fresh_instance, iterations),
+        'pooled YoutubeDL': measure(lambda: pooled_instance(pool), iterations),
+    }
+    print(f"{'variant':<30} {'mean':>10} {'p50':>10} {'p99':>10}")
+    for name, r in results.items():
+        print(f"{name:<30} {r['mean_ms']:>8.3f}ms {r['p50_ms']:>8.3f}ms {r['p99_ms']:>8.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
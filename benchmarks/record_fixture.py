@@ -0,0 +1,33 @@
+# benchmarks/record_fixture.py
+"""
+Records the info_dict yt-dlp extracts for a URL, for use with the stub
+backend (bench_request_path.py --fixture). Needs network access.
+
+Usage: python benchmarks/record_fixture.py URL OUTPUT.json
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import yt_dlp  # noqa: E402
+
+from extraction import YDL_OPTS  # noqa: E402
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    url, output = sys.argv[1], sys.argv[2]
+    with yt_dlp.YoutubeDL(dict(YDL_OPTS)) as ydl:
+        info_dict = ydl.sanitize_info(ydl.extract_info(url, download=False))
+    if not info_dict:
+        sys.exit(f"Could not extract {url}")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(info_dict, f)
+    print(f"Wrote {len(info_dict.get('formats') or [])} formats to {output}")
+
+
+if __name__ == '__main__':
+    main()
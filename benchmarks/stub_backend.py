@@ -0,0 +1,121 @@
+# benchmarks/stub_backend.py
+"""
+Deterministic extraction backend for offline benchmarks.
+
+Instead of running yt-dlp it hands build_payload an info_dict that looks
+like a recorded YouTube extraction: the same format fields, realistic
+signed googlevideo URLs (~1 KB each) and a configurable number of formats.
+Recorded info_dicts (see record_fixture.py) can be used instead of the
+generated ones.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from extraction import build_payload  # noqa: E402
+
+_VIDEO_FORMATS = [
+    # (format_note, height, vcodec, ext)
+    ('144p', 144, 'avc1.4d400c', 'mp4'), ('240p', 240, 'avc1.4d4015', 'mp4'),
+    ('360p', 360, 'avc1.4d401e', 'mp4'), ('480p', 480, 'avc1.4d401f', 'mp4'),
+    ('720p', 720, 'avc1.4d401f', 'mp4'), ('1080p', 1080, 'avc1.640028', 'mp4'),
+    ('1440p', 1440, 'vp09.00.50.08', 'webm'), ('2160p', 2160, 'vp09.00.51.08', 'webm'),
+    ('720p60', 720, 'avc1.4d4020', 'mp4'), ('1080p60', 1080, 'avc1.64002a', 'mp4'),
+]
+_AUDIO_FORMATS = [
+    # (format_note, abr, acodec, ext)
+    ('low', 48, 'opus', 'webm'), ('low', 50, 'opus', 'webm'), ('medium', 129, 'mp4a.40.2', 'm4a'),
+    ('medium', 160, 'opus', 'webm'),
+]
+
+
+_TOKEN_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_'
+
+
+def _signed_url(rng, itag, expire):
+    # Same parameters, lengths and ordering as a real googlevideo videoplayback URL
+    def token(n):
+        return ''.join(rng.choice(_TOKEN_CHARS) for _ in range(n))
+    return (
+        f"https://rr{rng.randint(1, 8)}---sn-{token(8).lower()}.googlevideo.com/videoplayback"
+        f"?expire={expire}&ei={token(22)}&ip=203.0.113.{rng.randint(1, 254)}&id=o-{token(44)}"
+        f"&itag={itag}&source=youtube&requiressl=yes&xpc={token(24)}&mh=Rk&mm=31%2C29&mn=sn-{token(8).lower()}"
+        f"&ms=au%2Crdu&mv=m&mvi=2&pl=24&initcwndbps={rng.randint(100000, 9000000)}&vprv=1"
+        f"&svpuc=1&mime=video%2Fmp4&gir=yes&clen={rng.randint(10**5, 10**9)}&dur=212.091"
+        f"&lmt={rng.randint(10**15, 10**16)}&mt={expire - 21000}&fvip=4&keepalive=yes&c=WEB"
+        f"&txp=5535434&sparams=expire%2Cei%2Cip%2Cid%2Citag%2Csource%2Crequiressl%2Cxpc%2Cvprv%2Csvpuc"
+        f"%2Cmime%2Cgir%2Cclen%2Cdur%2Clmt&sig={token(88)}"
+        f"&lsparams=mh%2Cmm%2Cmn%2Cms%2Cmv%2Cmvi%2Cpl%2Cinitcwndbps&lsig={token(72)}"
+    )
+
+
+def make_info_dict(format_count, video_id='dQw4w9WgXcQ', seed=0, ttl=6 * 3600):
+    """
+    Builds a YouTube-shaped info_dict with format_count formats. The same
+    arguments always produce the same dict, apart from expire= timestamps.
+    """
+    rng = random.Random(f"{seed}:{video_id}:{format_count}")
+    expire = int(time.time()) + ttl
+    formats = []
+    for i in range(format_count):
+        itag = 100 + i
+        if i % 3 == 2:
+            note, abr, acodec, ext = _AUDIO_FORMATS[i % len(_AUDIO_FORMATS)]
+            fmt = {'format_note': note, 'abr': abr, 'acodec': acodec, 'vcodec': 'none', 'ext': ext}
+        else:
+            note, height, vcodec, ext = _VIDEO_FORMATS[i % len(_VIDEO_FORMATS)]
+            fmt = {'format_note': note, 'height': height, 'width': height * 16 // 9,
+                   'vcodec': vcodec, 'acodec': 'none' if i % 5 else 'mp4a.40.2', 'ext': ext}
+        fmt.update({
+            'format_id': str(itag),
+            'url': _signed_url(rng, itag, expire),
+            'protocol': 'https',
+            'filesize': rng.randint(10**5, 10**9) if i % 4 else None,
+            'filesize_approx': rng.randint(10**5, 10**9),
+            'tbr': round(rng.uniform(30, 9000), 3),
+            'http_headers': {'User-Agent': 'Mozilla/5.0', 'Accept-Language': 'en-us,en;q=0.5'},
+        })
+        formats.append(fmt)
+    return {
+        'id': video_id,
+        'title': f"Benchmark video {video_id} with {format_count} formats",
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg",
+        'extractor_key': 'Youtube',
+        'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+        'duration': 212,
+        'formats': formats,
+    }
+
+
+def load_info_dict(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class StubBackend:
+    """
+    Extraction backend that returns the same recorded info_dict for every
+    URL, optionally after a fixed simulated extraction delay.
+    """
+    name = 'stub'
+
+    def __init__(self, info_dict, extract_delay=0.0):
+        self._info_dict = info_dict
+        self._extract_delay = extract_delay
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def extract(self, video_url):
+        with self._calls_lock:
+            self.calls += 1
+        if self._extract_delay:
+            time.sleep(self._extract_delay)
+        return build_payload(self._info_dict)
+
+    def stats(self):
+        return {'name': self.name, 'calls': self.calls, 'formats': len(self._info_dict.get('formats', []))}
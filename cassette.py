@@ -0,0 +1,222 @@
+# cassette.py
+import base64
+import contextvars
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit
+
+import yt_dlp
+from yt_dlp.networking.common import Request, RequestHandler, Response
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+
+import extraction
+from video_cache import normalize_url
+from ydl_pool import YoutubeDLPool
+
+# "record" runs real extractions and saves every HTTP exchange; "replay" serves them from disk
+CASSETTE_MODE = os.environ.get('CASSETTE_MODE', 'replay')
+# One gzipped JSON cassette per video URL is kept here
+CASSETTE_DIR = os.environ.get('CASSETTE_DIR', 'cassettes')
+
+# Bodies are stored already decoded, so these would no longer be true on replay
+_DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+# The cassette of the extraction running on this thread
+_active = contextvars.ContextVar('cassette', default=None)
+
+
+def _body_digest(data):
+    if data is None:
+        return None
+    if not isinstance(data, bytes):
+        # yt-dlp only sends bytes bodies for extraction requests; anything else is not matched on
+        return 'stream'
+    return hashlib.sha1(data).hexdigest()
+
+
+def _without_query(url):
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+
+
+class Cassette:
+    """
+    The HTTP exchanges of one extraction, in the order they happened.
+
+    Replay matches a request on method, URL and body first, then on method
+    and URL without the query string (for cache busters and other per-run
+    parameters), each time taking the earliest exchange not yet served.
+    """
+
+    def __init__(self, path, video_url, exchanges=None):
+        self.path = path
+        self.video_url = video_url
+        self.exchanges = exchanges if exchanges is not None else []
+        self._exact = {}
+        self._loose = {}
+        for exchange in self.exchanges:
+            self._exact.setdefault(self._exact_key(exchange), deque()).append(exchange)
+            self._loose.setdefault(self._loose_key(exchange), deque()).append(exchange)
+        self._served = set()
+
+    @staticmethod
+    def _exact_key(exchange):
+        return exchange['method'], exchange['url'], exchange['body_sha1']
+
+    @staticmethod
+    def _loose_key(exchange):
+        return exchange['method'], _without_query(exchange['url'])
+
+    def record(self, request, response, body):
+        self.exchanges.append({
+            'method': request.method,
+            'url': request.url,
+            'body_sha1': _body_digest(request.data),
+            'status': response.status,
+            'reason': response.reason,
+            'response_url': response.url,
+            'headers': [(k, v) for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS],
+            'body': base64.b64encode(body).decode('ascii'),
+        })
+
+    def play(self, request):
+        key = (request.method, request.url, _body_digest(request.data))
+        for queue in (self._exact.get(key), self._loose.get((request.method, _without_query(request.url)))):
+            while queue:
+                exchange = queue.popleft()
+                if id(exchange) not in self._served:
+                    self._served.add(id(exchange))
+                    return exchange
+        raise TransportError(f"No recorded response for {request.method} {request.url} in {self.path}")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump({'video_url': self.video_url, 'recorded_at': time.time(), 'exchanges': self.exchanges}, f)
+        os.replace(tmp_path, self.path)
+
+
+def _response_from(exchange):
+    return Response(
+        io.BytesIO(base64.b64decode(exchange['body'])),
+        url=exchange['response_url'],
+        headers=dict(exchange['headers']),
+        status=exchange['status'],
+        reason=exchange['reason'],
+    )
+
+
+class CassetteRH(RequestHandler):
+    """
+    Request handler that answers from the active cassette instead of the network.
+    """
+    _SUPPORTED_URL_SCHEMES = ('http', 'https')
+    _SUPPORTED_PROXY_SCHEMES = None
+    _SUPPORTED_FEATURES = None
+
+    def _check_extensions(self, extensions):
+        # Timeouts, cookie jars, impersonation etc. mean nothing for a recording
+        extensions.clear()
+
+    def _send(self, request):
+        cassette = _active.get()
+        if cassette is None:
+            raise TransportError(f"No cassette loaded for {request.url}")
+        response = _response_from(cassette.play(request))
+        if response.status >= 400:
+            raise HTTPError(response)
+        return response
+
+
+class CassetteYoutubeDL(yt_dlp.YoutubeDL):
+    """
+    YoutubeDL that records its HTTP traffic into, or replays it from, the
+    active cassette, depending on the "cassette_mode" param.
+    """
+
+    def build_request_director(self, handlers, preferences=None):
+        if self.params.get('cassette_mode') == 'replay':
+            # Nothing may reach the network while replaying
+            handlers, preferences = [CassetteRH], None
+        return super().build_request_director(handlers, preferences)
+
+    def urlopen(self, req):
+        cassette = _active.get()
+        if self.params.get('cassette_mode') != 'record' or cassette is None:
+            return super().urlopen(req)
+        if isinstance(req, str):
+            req = Request(req)
+        try:
+            response = super().urlopen(req)
+        except HTTPError as e:
+            body = e.response.read()
+            cassette.record(req, e.response, body)
+            raise HTTPError(Response(io.BytesIO(body), e.response.url, dict(e.response.headers.items()),
+                                     e.response.status, e.response.reason)) from None
+        body = response.read()
+        cassette.record(req, response, body)
+        return Response(io.BytesIO(body), response.url, dict(response.headers.items()),
+                        response.status, response.reason)
+
+
+class CassetteBackend:
+    """
+    Extraction backend running the real yt-dlp extractors against recorded
+    HTTP traffic, so the whole get_video_info pipeline can be benchmarked and
+    profiled offline. Record once with CASSETTE_MODE=record (needs network),
+    then replay with CASSETTE_MODE=replay.
+    """
+    name = 'cassette'
+
+    def __init__(self, mode=CASSETTE_MODE, directory=CASSETTE_DIR):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown CASSETTE_MODE {mode!r}, expected record or replay")
+        self.mode = mode
+        self.directory = directory
+        # The on-disk YoutubeDL cache would let replays skip requests that were recorded
+        opts = {**extraction.YDL_OPTS, 'cachedir': False, 'cassette_mode': mode}
+        self._pool = YoutubeDLPool(opts, ydl_class=CassetteYoutubeDL)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, video_url):
+        digest = hashlib.sha1(normalize_url(video_url).encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.directory, f"{digest}.json.gz")
+
+    def _load(self, video_url):
+        path = self.path_for(video_url)
+        with self._lock:
+            exchanges = self._loaded.get(path)
+        if exchanges is None:
+            if not os.path.exists(path):
+                raise yt_dlp.utils.DownloadError(f"No cassette recorded for {video_url}")
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                exchanges = json.load(f)['exchanges']
+            with self._lock:
+                self._loaded[path] = exchanges
+        return Cassette(path, video_url, exchanges)
+
+    def extract(self, video_url):
+        if self.mode == 'replay':
+            cassette = self._load(video_url)
+        else:
+            cassette = Cassette(self.path_for(video_url), video_url)
+        token = _active.set(cassette)
+        try:
+            return extraction.extract_video_info(video_url, pool=self._pool)
+        finally:
+            _active.reset(token)
+            if self.mode == 'record':
+                cassette.save()
+                logging.info(f"Recorded {len(cassette.exchanges)} HTTP exchanges for {video_url} to {cassette.path}")
+
+    def stats(self):
+        return {'name': self.name, 'mode': self.mode, 'loaded_cassettes': len(self._loaded)}
@@ -0,0 +1,195 @@
+# codec.py
+import json
+import os
+import struct
+import threading
+import time
+
+import msgpack
+import zstandard
+
+# zstd level for stored entries; higher trades encode CPU for smaller entries
+CODEC_LEVEL = int(os.environ.get('CACHE_CODEC_LEVEL', '3'))
+# Train a zstd dictionary once this many entries have been encoded (0 disables)
+CODEC_TRAIN_SAMPLES = int(os.environ.get('CACHE_CODEC_TRAIN_SAMPLES', '200'))
+# Size of the trained dictionary in bytes
+CODEC_DICT_SIZE = int(os.environ.get('CACHE_CODEC_DICT_SIZE', str(64 * 1024)))
+
+# First byte of an encoded entry
+_ZSTD = b'\x01'
+_ZSTD_DICT = b'\x02'
+_DICT_ID = struct.Struct('<I')
+
+
+class UnknownDictionaryError(Exception):
+    def __init__(self, dict_id):
+        super().__init__(f"Unknown zstd dictionary {dict_id}")
+        self.dict_id = dict_id
+
+
+class PayloadCodec:
+    """
+    Encodes payloads as msgpack compressed with zstd. Once CODEC_TRAIN_SAMPLES
+    entries have been seen it trains a dictionary on them, since most of every
+    payload is signed URLs that share long runs of parameters. Entries record
+    the dictionary they were compressed with, so older ones stay readable.
+    JSON entries written before this codec existed are still decoded.
+
+    Training runs in a background thread. on_trained(data) is called from it
+    with the bytes of the new dictionary, so whoever stores the entries can
+    store the dictionary with them. If given, load_trained() is called first
+    and may load a dictionary stored by someone else (returning True) to
+    skip training altogether.
+    """
+
+    def __init__(self, dictionary=None, level=CODEC_LEVEL, train_samples=CODEC_TRAIN_SAMPLES, on_trained=None,
+                 load_trained=None):
+        self._level = level
+        self._on_trained = on_trained
+        self._load_trained = load_trained
+        self._train_samples = train_samples
+        self._dictionaries = {}
+        self._current = None
+        self._samples = []
+        self._lock = threading.Lock()
+        # zstd (de)compressor objects must not be shared between threads
+        self._local = threading.local()
+        self.encoded = 0
+        self.decoded = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.encode_seconds = 0.0
+        self.decode_seconds = 0.0
+        if dictionary is not None:
+            self.add_dictionary(dictionary, use=True)
+
+    @property
+    def dictionary(self):
+        """
+        Bytes of the dictionary new entries are compressed with, or None.
+        """
+        current = self._current
+        return current.as_bytes() if current is not None else None
+
+    def add_dictionary(self, data, use=False):
+        """
+        Makes a dictionary available for decoding (and encoding if use is set).
+        Returns its id.
+        """
+        dictionary = zstandard.ZstdCompressionDict(data)
+        dict_id = dictionary.dict_id()
+        with self._lock:
+            self._dictionaries.setdefault(dict_id, dictionary)
+            if use:
+                self._current = self._dictionaries[dict_id]
+                self._samples = []
+        return dict_id
+
+    def train(self, samples):
+        """
+        Trains a dictionary on msgpack-encoded samples and starts using it.
+        Returns its bytes.
+        """
+        data = zstandard.train_dictionary(CODEC_DICT_SIZE, samples, level=self._level).as_bytes()
+        self.add_dictionary(data, use=True)
+        return data
+
+    def _compressor(self, dictionary):
+        compressors = self._local.__dict__.setdefault('compressors', {})
+        key = dictionary.dict_id() if dictionary is not None else None
+        compressor = compressors.get(key)
+        if compressor is None:
+            compressor = zstandard.ZstdCompressor(level=self._level, dict_data=dictionary)
+            compressors[key] = compressor
+        return compressor
+
+    def _decompressor(self, dictionary):
+        decompressors = self._local.__dict__.setdefault('decompressors', {})
+        key = dictionary.dict_id() if dictionary is not None else None
+        decompressor = decompressors.get(key)
+        if decompressor is None:
+            decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+            decompressors[key] = decompressor
+        return decompressor
+
+    def pack(self, payload):
+        return msgpack.packb(payload, use_bin_type=True)
+
+    def encode(self, payload):
+        """
+        Returns the stored form of a payload.
+        """
+        started = time.perf_counter()
+        raw = self.pack(payload)
+        dictionary = self._current
+        if dictionary is None:
+            data = _ZSTD + self._compressor(None).compress(raw)
+        else:
+            data = _ZSTD_DICT + _DICT_ID.pack(dictionary.dict_id()) + self._compressor(dictionary).compress(raw)
+        with self._lock:
+            self.encoded += 1
+            self.raw_bytes += len(raw)
+            self.stored_bytes += len(data)
+            self.encode_seconds += time.perf_counter() - started
+        self._collect(raw)
+        return data
+
+    def _collect(self, raw):
+        if self._current is not None or not self._train_samples:
+            return
+        with self._lock:
+            if self._current is not None or len(self._samples) >= self._train_samples:
+                return
+            self._samples.append(raw)
+            if len(self._samples) < self._train_samples:
+                return
+            samples = self._samples
+        # Training takes long enough to show in request latency; entries are
+        # compressed without a dictionary until it is ready
+        threading.Thread(target=self._train_in_background, args=(samples,), name='codec-train', daemon=True).start()
+
+    def _train_in_background(self, samples):
+        if self._load_trained is not None and self._load_trained():
+            return
+        try:
+            data = self.train(samples)
+        except zstandard.ZstdError:
+            # Too little data to train on; keep compressing without a dictionary
+            with self._lock:
+                self._samples = []
+                self._train_samples = 0
+            return
+        if self._on_trained is not None:
+            self._on_trained(data)
+
+    def decode(self, data):
+        started = time.perf_counter()
+        data = bytes(data)
+        marker = data[:1]
+        if marker == _ZSTD:
+            payload = msgpack.unpackb(self._decompressor(None).decompress(data[1:]), raw=False)
+        elif marker == _ZSTD_DICT:
+            (dict_id,) = _DICT_ID.unpack_from(data, 1)
+            dictionary = self._dictionaries.get(dict_id)
+            if dictionary is None:
+                raise UnknownDictionaryError(dict_id)
+            payload = msgpack.unpackb(
+                self._decompressor(dictionary).decompress(data[1 + _DICT_ID.size:]), raw=False)
+        else:
+            payload = json.loads(data)
+        with self._lock:
+            self.decoded += 1
+            self.decode_seconds += time.perf_counter() - started
+        return payload
+
+    def stats(self):
+        current = self._current
+        return {
+            'encoded': self.encoded,
+            'decoded': self.decoded,
+            'compression_ratio': round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else None,
+            'avg_stored_bytes': round(self.stored_bytes / self.encoded) if self.encoded else None,
+            'encode_us': round(self.encode_seconds / self.encoded * 1e6, 1) if self.encoded else None,
+            'decode_us': round(self.decode_seconds / self.decoded * 1e6, 1) if self.decoded else None,
+            'dictionary_id': current.dict_id() if current is not None else None,
+        }
@@ -0,0 +1,89 @@
+# compact.py
+import sys
+
+from tinylfu import estimate_size
+
+_FORMAT_KEYS = ('ext', 'quality', 'size', 'url')
+
+
+def _label(value):
+    # The same few dozen ext/quality labels repeat across every cached video
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Format:
+    """
+    One entry of a payload's "formats" list, stored without a per-format dict.
+    """
+
+    __slots__ = _FORMAT_KEYS
+
+    def __init__(self, ext, quality, size, url):
+        self.ext = _label(ext)
+        self.quality = _label(quality)
+        self.size = size
+        self.url = url
+
+    def to_dict(self):
+        return {'ext': self.ext, 'quality': self.quality, 'size': self.size, 'url': self.url}
+
+    def nbytes(self):
+        # ext and quality are interned and shared, so only the pointers count
+        return sys.getsizeof(self) + estimate_size(self.url) + (estimate_size(self.size) if self.size else 0)
+
+
+class CompactPayload:
+    """
+    A get_video_info payload as kept in the in-process cache: formats are
+    slotted records in a tuple, and the response dict is rebuilt on each hit.
+    """
+
+    __slots__ = ('title', 'thumbnail', 'formats', 'extra')
+
+    def __init__(self, title, thumbnail, formats, extra):
+        self.title = title
+        self.thumbnail = thumbnail
+        self.formats = formats
+        # Any other top-level keys (canonical_id), or None
+        self.extra = extra
+
+    def to_dict(self):
+        payload = {
+            'title': self.title,
+            'thumbnail': self.thumbnail,
+            'formats': [f.to_dict() for f in self.formats],
+        }
+        if self.extra:
+            payload.update(self.extra)
+        return payload
+
+    def nbytes(self):
+        return (sys.getsizeof(self) + estimate_size(self.title) + estimate_size(self.thumbnail)
+                + sys.getsizeof(self.formats) + sum(f.nbytes() for f in self.formats)
+                + (estimate_size(self.extra) if self.extra else 0))
+
+
+def pack(payload):
+    """
+    Returns a CompactPayload for a regular get_video_info payload. Anything
+    else (negative entries, unexpected shapes) is returned unchanged.
+    """
+    formats = payload.get('formats')
+    if not isinstance(formats, list) or 'title' not in payload or 'thumbnail' not in payload:
+        return payload
+    if any(not isinstance(f, dict) or tuple(f) != _FORMAT_KEYS for f in formats):
+        return payload
+    extra = {k: v for k, v in payload.items() if k not in ('title', 'thumbnail', 'formats')}
+    return CompactPayload(
+        payload.get('title'),
+        payload.get('thumbnail'),
+        tuple(Format(f['ext'], f['quality'], f['size'], f['url']) for f in formats),
+        extra or None,
+    )
+
+
+def unpack(value):
+    """
+    Returns the payload dict for a value produced by pack().
+    """
+    return value.to_dict() if isinstance(value, CompactPayload) else value
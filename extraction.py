@@ -0,0 +1,159 @@
+# extraction.py
+import yt_dlp
+import threading
+import time
+
+import metrics
+import timing
+from extractor_index import ExtractorIndex
+from ydl_pool import YoutubeDLPool
+
+class _ErrorCapture:
+    """
+    yt-dlp logger that remembers the last error reported on this thread.
+    With ignoreerrors, extract_info returns None instead of raising, and this
+    is the only place the actual reason (private, removed, geo-blocked...) shows up.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def debug(self, msg):
+        pass
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        self._local.last = msg
+
+    def reset(self):
+        self._local.last = None
+
+    def last(self):
+        return getattr(self._local, 'last', None)
+
+
+yt_dlp_errors = _ErrorCapture()
+
+# More robust yt-dlp options to increase success rate
+YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+    'noplaylist': True,
+    'ignoreerrors': True,  # Ignore errors on individual videos
+    'geo_bypass': True,  # Attempt to bypass geographic restrictions
+    'nocheckcertificate': True,  # Suppress SSL certificate verification
+    'source_address': '0.0.0.0',  # Force IPv4, which can sometimes help
+    'logger': yt_dlp_errors,
+}
+
+
+def build_payload(info_dict):
+    """
+    Turns a yt-dlp info_dict into the response payload sent to the client:
+    title, thumbnail and a deduplicated list of formats with direct URLs.
+    Raises DownloadError if nothing usable was extracted.
+    """
+    # Check if info was actually extracted
+    if not info_dict:
+        raise yt_dlp.utils.DownloadError("Failed to extract video information.")
+
+    title = info_dict.get('title', 'No title')
+    thumbnail = info_dict.get('thumbnail', '')
+
+    formats = []
+
+    # Check if any formats are available
+    if not info_dict.get('formats'):
+        raise yt_dlp.utils.DownloadError("No downloadable formats found for this video.")
+
+    # Collect and filter formats
+    for f in info_dict.get('formats', []):
+        # We only want formats with a direct URL that we can send to the client
+        if f.get('url') and (f.get('vcodec') != 'none' or f.get('acodec') != 'none'):
+            file_size = f.get('filesize') or f.get('filesize_approx')
+
+            # Create a quality label
+            quality_label = f.get('format_note')
+            if not quality_label:
+                if f.get('height'):
+                    quality_label = f"{f.get('height')}p"
+                elif f.get('vcodec') == 'none':
+                    quality_label = f"Audio ({f.get('abr')}k)"
+                else:
+                    quality_label = "Unknown"
+
+            formats.append({
+                'ext': f.get('ext'),
+                'quality': quality_label,
+                'size': file_size,
+                'url': f.get('url'),
+            })
+
+    # Raise error if no valid formats were found
+    if not formats:
+        raise yt_dlp.utils.DownloadError("Could not find any valid formats with direct URLs.")
+
+    # Simple deduplication based on quality label to avoid clutter
+    unique_formats = []
+    seen_qualities = set()
+    for f in sorted(formats, key=lambda x: x.get('size') or 0, reverse=True):
+        if f['quality'] not in seen_qualities:
+            unique_formats.append(f)
+            seen_qualities.add(f['quality'])
+
+    return {
+        'title': title,
+        'thumbnail': thumbnail,
+        'formats': unique_formats,
+    }
+
+
+# Warm YoutubeDL instances shared by all requests in this worker
+ydl_pool = YoutubeDLPool(YDL_OPTS)
+# Hostname -> extractor lookup, built once at startup
+extractor_index = ExtractorIndex()
+
+
+def extract_video_info(video_url, pool=None):
+    """
+    Runs a full yt-dlp extraction for a URL and returns the response payload.
+    Uses the worker's shared YoutubeDL pool unless another pool is given.
+    """
+    pool = pool or ydl_pool
+    # Pick the extractor up front so yt-dlp does not scan all of them
+    with timing.stage('dispatch'):
+        ie_key = extractor_index.match(video_url)
+    extractor = ie_key or 'Generic'
+    try:
+        with pool.acquire() as ydl:
+            started = time.perf_counter()
+            # Extract video information
+            yt_dlp_errors.reset()
+            with timing.stage('extract'):
+                info_dict = ydl.extract_info(video_url, download=False, ie_key=ie_key)
+        extracted = time.perf_counter()
+        if info_dict:
+            extractor = info_dict.get('extractor_key') or extractor
+        elif yt_dlp_errors.last():
+            # Surface yt-dlp's own reason rather than a generic failure
+            raise yt_dlp.utils.DownloadError(yt_dlp_errors.last())
+        timing.note('extractor', extractor)
+        metrics.EXTRACT_SECONDS.labels(extractor).observe(extracted - started)
+
+        with timing.stage('postprocess'):
+            payload = build_payload(info_dict)
+        metrics.POSTPROCESS_SECONDS.labels(extractor).observe(time.perf_counter() - extracted)
+    except yt_dlp.utils.DownloadError:
+        metrics.EXTRACTIONS.labels(extractor, 'error_fetch_failed').inc()
+        raise
+    except Exception:
+        metrics.EXTRACTIONS.labels(extractor, 'error_server_error').inc()
+        raise
+    metrics.EXTRACTIONS.labels(extractor, 'success').inc()
+    return payload
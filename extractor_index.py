@@ -0,0 +1,203 @@
+# extractor_index.py
+import functools
+import logging
+import re
+import threading
+from urllib.parse import parse_qsl, urlsplit
+
+from yt_dlp.extractor import gen_extractor_classes
+
+# Forget verified URL shapes past this many, so odd hosts cannot grow the table forever
+MAX_VERIFIED_SHAPES = 10000
+# A host whose first this many URL shapes all agreed with the full scan is trusted for every shape
+HOST_TRUSTED_AFTER = 8
+
+# Query parameters that never change which video a URL plays: start times, share and tracking tags
+_NEUTRAL_PARAMS = frozenset((
+    't', 'start', 'si', 'feature', 'pp', 'ab_channel', 'fbclid', 'igsh', 'igshid',
+    'is_from_webapp', 'sender_device', 'share_source', 'spm_id_from', 'vd_source',
+))
+
+# Path segments that look like ids (any digit or capital letter, or very long) are
+# masked in URL shapes, so youtu.be/<id> or vimeo.com/<id> is one shape, not one per video
+_ID_SEGMENT_RE = re.compile(r'[0-9A-Z]|.{17}')
+
+# [yY][oO][uU]... style case-insensitive letters, folded back to plain lowercase
+_CASE_PAIR_RE = re.compile(r'\[([a-zA-Z])([a-zA-Z])\]')
+# Optional plain-word groups such as youtube(?:kids)?\.com
+_OPTIONAL_WORD_RE = re.compile(r'\(\?:[a-z0-9-]+\)\?')
+# Plain-word alternations right before a TLD such as (?:vimeo|vimeopro)\.com
+_ALTERNATION_RE = re.compile(r'\(\?:([a-z0-9-]+(?:\|[a-z0-9-]+)+)\)((?:\\\.[a-z0-9-]+)+)')
+# Single optional letters such as tiktokv?\.com
+_OPTIONAL_CHAR_RE = re.compile(r'([a-z0-9])\?(?=[a-z0-9\\])')
+# Literal dotted host names inside a URL regex, e.g. youtu\.be or player\.vimeo\.com
+_DOMAIN_RE = re.compile(r'((?:[a-z0-9-]+\\\.)+[a-z]{2,})(?![a-z0-9-])')
+# Host names with a wildcard TLD such as dailymotion\.[a-z]{2,3}
+_WILDCARD_TLD_RE = re.compile(r'([a-z0-9-]+)\\\.(?:\[a-z|\(\?:[a-z|]+\))')
+
+
+def _registrable_suffix(host):
+    # Good enough for bucketing; a wide bucket like co.uk only costs a few extra regex checks
+    return '.'.join(host.split('.')[-2:])
+
+
+def _regex_hosts(pattern):
+    """
+    Returns (domains, labels): registrable domains named literally in a URL
+    regex, and second-level labels that appear with a wildcard TLD.
+    """
+    pattern = _CASE_PAIR_RE.sub(
+        lambda m: m.group(1).lower() if m.group(1).lower() == m.group(2).lower() else m.group(0),
+        pattern)
+    pattern = _OPTIONAL_WORD_RE.sub('', pattern)
+    pattern = _ALTERNATION_RE.sub(
+        lambda m: ' '.join(word + m.group(2) for word in m.group(1).split('|')),
+        pattern)
+    domains, labels = set(), set()
+    for variant in (_OPTIONAL_CHAR_RE.sub(r'\1', pattern), _OPTIONAL_CHAR_RE.sub('', pattern)):
+        domains |= {_registrable_suffix(d.replace('\\.', '.').lower()) for d in _DOMAIN_RE.findall(variant)}
+        labels |= {label.lower() for label in _WILDCARD_TLD_RE.findall(variant)}
+    return domains, labels
+
+
+def _url_suffixes(host):
+    # www.youtube.com -> ['www.youtube.com', 'youtube.com']
+    labels = host.split('.')
+    return ['.'.join(labels[i:]) for i in range(len(labels) - 1)]
+
+
+class ExtractorIndex:
+    """
+    Maps a URL's hostname to the yt-dlp extractors that can handle it, so the
+    right ie_key can be passed to extract_info instead of letting yt-dlp try
+    every extractor's suitable() in turn.
+
+    The index is built from the host names that appear literally in each
+    extractor's _VALID_URL. Extractors without any recognisable host (generic
+    embeds, "any site running X" extractors) are tried for every URL, and
+    candidates are always tried in yt-dlp's own order, so the first suitable
+    candidate is the one yt-dlp would have picked.
+
+    Because host names are recovered heuristically, the first URL of every
+    (host, first path segment) shape is also checked against a full scan;
+    shapes where the two disagree always use the full scan from then on.
+    Id-like segments are masked out of shapes, and a host is trusted as a
+    whole once HOST_TRUSTED_AFTER of its shapes agreed.
+    """
+
+    def __init__(self, extractor_classes=None):
+        classes = [ie for ie in (extractor_classes or gen_extractor_classes()) if ie.ie_key() != 'Generic']
+        self._classes = classes
+        self._by_key = {ie.ie_key(): ie for ie in classes}
+        self._by_domain = {}
+        self._by_label = {}
+        self._hostless = []
+        for position, ie in enumerate(classes):
+            domains, labels = set(), set()
+            for pattern in (ie._VALID_URL if isinstance(ie._VALID_URL, (list, tuple)) else [ie._VALID_URL]):
+                if isinstance(pattern, str):
+                    pattern_domains, pattern_labels = _regex_hosts(pattern)
+                    domains |= pattern_domains
+                    labels |= pattern_labels
+            for domain in domains:
+                self._by_domain.setdefault(domain, []).append((position, ie))
+            for label in labels:
+                self._by_label.setdefault(label, []).append((position, ie))
+            if not domains and not labels:
+                self._hostless.append((position, ie))
+        self._host_candidates = functools.lru_cache(maxsize=MAX_VERIFIED_SHAPES)(self._candidates_for_host)
+        # ie_key -> whether the extractor returns a single video rather than a playlist
+        self._single_video = {}
+        self._verified_shapes = {}
+        # host -> number of its shapes that agreed, or -1 once one disagreed
+        self._host_agreements = {}
+        self._lock = threading.Lock()
+        logging.info(f"Indexed {len(classes)} extractors under {len(self._by_domain)} domains "
+                     f"({len(self._hostless)} without a fixed domain)")
+
+    def candidates(self, url):
+        """
+        Extractors that may handle the URL, in yt-dlp's order.
+        """
+        return self._host_candidates((urlsplit(url).hostname or '').lower())
+
+    def _candidates_for_host(self, host):
+        found = {}
+        for suffix in _url_suffixes(host):
+            for position, ie in self._by_domain.get(suffix, ()):
+                found[position] = ie
+        for label in host.split('.')[:-1]:
+            for position, ie in self._by_label.get(label, ()):
+                found[position] = ie
+        for position, ie in self._hostless:
+            found[position] = ie
+        return tuple(found[position] for position in sorted(found))
+
+    def _indexed_match(self, url, host=None):
+        candidates = self.candidates(url) if host is None else self._host_candidates(host)
+        for ie in candidates:
+            if ie.suitable(url):
+                return ie.ie_key()
+        return None
+
+    def _full_scan(self, url):
+        for ie in self._classes:
+            if ie.suitable(url):
+                return ie.ie_key()
+        return None
+
+    def match(self, url):
+        """
+        Returns the key of the extractor yt-dlp would use for the URL, or None
+        to let yt-dlp fall back to its own scan (and the generic extractor).
+        """
+        parts = urlsplit(url)
+        host = (parts.hostname or '').lower()
+        segment = parts.path.lstrip('/').split('/', 1)[0]
+        shape = (host, '*' if _ID_SEGMENT_RE.search(segment) else segment)
+        trusted = self._verified_shapes.get(shape)
+        if trusted is None and self._host_agreements.get(host, 0) >= HOST_TRUSTED_AFTER:
+            trusted = True
+        if trusted is None:
+            ie_key = self._full_scan(url)
+            trusted = self._indexed_match(url, host) == ie_key
+            if not trusted:
+                logging.warning(f"Extractor index disagrees with full scan for {shape}, not using it there")
+            with self._lock:
+                if len(self._verified_shapes) >= MAX_VERIFIED_SHAPES:
+                    self._verified_shapes.clear()
+                    self._host_agreements.clear()
+                self._verified_shapes[shape] = trusted
+                agreements = self._host_agreements.get(host, 0)
+                if agreements >= 0:
+                    self._host_agreements[host] = agreements + 1 if trusted else -1
+            return ie_key
+        return self._indexed_match(url, host) if trusted else self._full_scan(url)
+
+    def _returns_single_video(self, ie_key):
+        single = self._single_video.get(ie_key)
+        if single is None:
+            # Derived by yt-dlp from the extractor's test cases
+            single = self._single_video[ie_key] = self._by_key[ie_key]._RETURN_TYPE == 'video'
+        return single
+
+    def canonical_id(self, url):
+        """
+        Returns "<extractor key>:<video id>" for a URL, using the matching
+        extractor's own URL regex, so every URL shape of the same video
+        (youtu.be/X, watch?v=X&t=30, shorts/X, ...) maps to one identity.
+        Returns None unless the URL names exactly one video: when no extractor
+        recognises a video id, when the extractor may return a playlist (its
+        id would then be the playlist's, e.g. watch?v=X&list=Y), or when a
+        query parameter may pick the item (list=, index=, bilibili's p=).
+        """
+        ie_key = self.match(url)
+        if ie_key is None or not self._returns_single_video(ie_key):
+            return None
+        video_id = self._by_key[ie_key].get_temp_id(url)
+        if not video_id:
+            return None
+        for name, value in parse_qsl(urlsplit(url).query, keep_blank_values=True):
+            if value != video_id and name not in _NEUTRAL_PARAMS and not name.startswith('utm_'):
+                return None
+        return f"{ie_key}:{video_id}"
@@ -0,0 +1,32 @@
+# gunicorn.conf.py
+import os
+import shutil
+import tempfile
+
+# gunicorn loads this file in the master before forking, so every worker inherits the
+# directory and /metrics aggregates all of them; without it each scrape would only see
+# the worker that happened to answer. One directory per master, so two servers on the
+# host do not mix their samples.
+_OWN_MULTIPROC_DIR = 'PROMETHEUS_MULTIPROC_DIR' not in os.environ
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), f'video_info_metrics-{os.getpid()}'))
+
+
+def on_starting(server):
+    # Samples left over from a previous run would be added to the new totals
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def on_exit(server):
+    if _OWN_MULTIPROC_DIR:
+        shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+
+
+def child_exit(server, worker):
+    # Drop the in-flight gauges of workers that are gone
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,70 @@
+# host_lock.py
+import fcntl
+import hashlib
+import os
+import tempfile
+
+# Lock files shared by all gunicorn workers on the host
+HOST_LOCK_DIR = os.environ.get('HOST_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'video_info_locks'))
+# How long a worker waits for another worker's extraction before doing its own
+HOST_LOCK_WAIT = float(os.environ.get('HOST_LOCK_WAIT', '30'))
+# How often a waiting worker checks the shared cache
+HOST_LOCK_POLL = float(os.environ.get('HOST_LOCK_POLL', '0.1'))
+
+
+class Lease:
+    def __init__(self, fd, path):
+        self._fd = fd
+        self._path = path
+
+    def release(self):
+        if self._fd is not None:
+            # Removed while still locked, so the directory only holds keys being extracted
+            try:
+                os.unlink(self._path)
+            except FileNotFoundError:
+                pass
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class HostLocks:
+    """
+    Per-key exclusive leases shared by every process on the host, built on
+    flock(). The kernel drops a lease when its holder exits, so a crashed
+    worker never leaves a key locked. Every key has its own lock file, named
+    by the key's full digest, so unrelated keys never wait for each other.
+    """
+
+    def __init__(self, directory=HOST_LOCK_DIR):
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self._directory, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.lock")
+
+    def try_acquire(self, key):
+        """
+        Returns a Lease if the key was free, or None if another holder has it.
+        """
+        path = self._path(key)
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return None
+            except BaseException:
+                os.close(fd)
+                raise
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None
+            if current is not None and os.path.samestat(os.fstat(fd), current):
+                return Lease(fd, path)
+            # The previous holder removed the file after we opened it; lock the one at path now
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
@@ -0,0 +1,166 @@
+# hot_set.py
+import heapq
+import logging
+import os
+import threading
+import time
+
+from negative_cache import is_negative
+
+# Number of most requested videos kept warm (0 disables the hot-set refresher)
+HOT_SET_SIZE = int(os.environ.get('HOT_SET_SIZE', '100'))
+# Request counts are halved every this many seconds, so the hot set follows current traffic
+HOT_SET_HALF_LIFE = float(os.environ.get('HOT_SET_HALF_LIFE', '600'))
+# Keys whose counts are tracked at all; the least requested are dropped beyond this
+HOT_SET_TRACKED = int(os.environ.get('HOT_SET_TRACKED', '10000'))
+# How often the refresher looks at the hot set (seconds)
+HOT_REFRESH_INTERVAL = float(os.environ.get('HOT_REFRESH_INTERVAL', '10'))
+# Hot entries are re-extracted once they are this close to expiry (seconds)
+HOT_REFRESH_AHEAD = float(os.environ.get('HOT_REFRESH_AHEAD', '300'))
+# Most hot-set refreshes started per minute by all workers on the host together
+# (by each worker when the shared cache is disabled)
+HOT_REFRESH_PER_MINUTE = float(os.environ.get('HOT_REFRESH_PER_MINUTE', '30'))
+
+# Counts below this after decay are forgotten
+_MIN_SCORE = 0.05
+
+
+class HotSet:
+    """
+    Exponentially decayed request counts per cache key, remembering the last
+    URL requested for each key so it can be re-extracted.
+    """
+
+    def __init__(self, size=HOT_SET_SIZE, half_life=HOT_SET_HALF_LIFE, tracked=HOT_SET_TRACKED):
+        self.size = size
+        self._half_life = half_life
+        self._tracked = tracked
+        self._scores = {}
+        self._urls = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, url, canonical_id):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._scores[key] = self._scores.get(key, 0.0) + 1.0
+            self._urls[key] = (url, canonical_id)
+
+    def decay(self, elapsed):
+        factor = 0.5 ** (elapsed / self._half_life)
+        with self._lock:
+            scores = {key: score * factor for key, score in self._scores.items() if score * factor >= _MIN_SCORE}
+            if len(scores) > self._tracked:
+                scores = dict(heapq.nlargest(self._tracked, scores.items(), key=lambda item: item[1]))
+            self._scores = scores
+            self._urls = {key: self._urls[key] for key in scores}
+
+    def top(self):
+        """
+        Returns [(key, url, canonical_id, score)] for the hottest keys, hottest first.
+        """
+        with self._lock:
+            hottest = heapq.nlargest(self.size, self._scores.items(), key=lambda item: item[1])
+            return [(key, *self._urls[key], score) for key, score in hottest]
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class TokenBucket:
+    """
+    In-process budget of per_minute takes a minute, allowing bursts of up to
+    a minute's worth.
+    """
+
+    def __init__(self, per_minute):
+        self._rate = per_minute / 60.0
+        self._capacity = max(per_minute, 1.0)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _add(self, count):
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            if tokens + count < 0:
+                self._tokens = tokens
+                return False
+            self._tokens = min(self._capacity, tokens + count)
+            return True
+
+    def take(self):
+        return self._add(-1)
+
+    def refund(self):
+        self._add(1)
+
+
+class HotRefresher:
+    """
+    Background thread that keeps the hot set warm: every HOT_REFRESH_INTERVAL
+    it asks schedule(key, url, canonical_id, entry) to re-extract hot keys that
+    are missing from the cache or close to expiry, hottest first, within a
+    budget of HOT_REFRESH_PER_MINUTE. Pass a budget shared by the workers
+    (anything with take() and refund()) to make that a host-wide limit.
+    """
+
+    def __init__(self, hot_set, cache, schedule, interval=HOT_REFRESH_INTERVAL, ahead=HOT_REFRESH_AHEAD,
+                 budget=None):
+        self._hot_set = hot_set
+        self._cache = cache
+        self._schedule = schedule
+        self._interval = interval
+        self._ahead = ahead
+        self._budget = budget if budget is not None else TokenBucket(HOT_REFRESH_PER_MINUTE)
+        self._last_tick = time.monotonic()
+        self._pid = None
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.over_budget = 0
+
+    def ensure_started(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        if self._pid == os.getpid() or self._hot_set.size <= 0:
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._last_tick = time.monotonic()
+                threading.Thread(target=self._loop, name='hot-refresh', daemon=True).start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self._interval)
+            try:
+                self.tick()
+            except Exception as e:
+                logging.error(f"Hot-set refresh failed: {e}")
+
+    def tick(self):
+        elapsed = time.monotonic() - self._last_tick
+        self._last_tick += elapsed
+        self._hot_set.decay(elapsed)
+
+        now = time.time()
+        for key, url, canonical_id, _ in self._hot_set.top():
+            entry = self._cache.peek(key)
+            if entry is not None and (is_negative(entry.payload) or entry.expires_at - now > self._ahead):
+                continue
+            if not self._budget.take():
+                self.over_budget += 1
+                break
+            if self._schedule(key, url, canonical_id, entry):
+                self.scheduled += 1
+            else:
+                # Already being refreshed
+                self._budget.refund()
+
+    def stats(self):
+        return {
+            'tracked': len(self._hot_set),
+            'scheduled': self.scheduled,
+            'over_budget': self.over_budget,
+        }
@@ -0,0 +1,199 @@
+# jobs.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from codec import PayloadCodec
+from shared_cache import thread_connection
+
+# Background extraction threads per worker process
+JOBS_WORKERS = int(os.environ.get('JOBS_WORKERS', '4'))
+# Refuse new jobs once this many URLs are waiting or running
+JOBS_MAX_PENDING = int(os.environ.get('JOBS_MAX_PENDING', '200'))
+# Maximum number of URLs in one job
+JOBS_MAX_URLS = int(os.environ.get('JOBS_MAX_URLS', '50'))
+# Finished jobs can be polled for this many seconds
+JOBS_RETENTION = int(os.environ.get('JOBS_RETENTION', '600'))
+# Jobs that never finished (their worker died) are forgotten this many seconds after submission
+JOBS_MAX_AGE = int(os.environ.get('JOBS_MAX_AGE', '3600'))
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, urls, id=None, created_at=None):
+        self.id = id or uuid.uuid4().hex
+        self.urls = urls
+        self.created_at = time.time() if created_at is None else created_at
+        self.finished_at = None
+        # url -> rendered result
+        self.results = {}
+        self.started = 0
+
+    @property
+    def status(self):
+        if self.finished_at is not None:
+            return 'done'
+        return 'running' if self.started else 'queued'
+
+
+class JobStore:
+    """
+    Job status and results in an SQLite file shared by all gunicorn workers,
+    so a job can be polled through whichever worker the request lands on.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._codec = PayloadCodec(train_samples=0)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY,'
+            ' urls TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' finished_at REAL,'
+            ' started INTEGER NOT NULL DEFAULT 0)')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS job_results ('
+            ' job_id TEXT NOT NULL,'
+            ' url TEXT NOT NULL,'
+            ' result BLOB NOT NULL,'
+            ' PRIMARY KEY (job_id, url))')
+
+    def _connection(self):
+        return thread_connection(self._local, self.path)
+
+    def _execute(self, sql, params=()):
+        try:
+            return self._connection().execute(sql, params)
+        except sqlite3.Error as e:
+            logging.warning(f"Job store query failed: {e}")
+            return None
+
+    def create(self, job):
+        self._execute('INSERT INTO jobs (id, urls, created_at) VALUES (?, ?, ?)',
+                      (job.id, json.dumps(job.urls), job.created_at))
+
+    def start(self, job):
+        self._execute('UPDATE jobs SET started = started + 1 WHERE id = ?', (job.id,))
+
+    def finish_url(self, job, url, result):
+        self._execute('INSERT OR REPLACE INTO job_results (job_id, url, result) VALUES (?, ?, ?)',
+                      (job.id, url, self._codec.encode(result)))
+        # Whichever thread stores the last result marks the job done, so a
+        # poll never sees a finished job with results still being written
+        self._execute('UPDATE jobs SET finished_at = ? WHERE id = ? AND finished_at IS NULL AND '
+                      '(SELECT COUNT(*) FROM job_results WHERE job_id = ?) = ?',
+                      (time.time(), job.id, job.id, len(job.urls)))
+
+    def load(self, job_id):
+        """
+        Returns the stored Job with its results, or None.
+        """
+        cursor = self._execute('SELECT urls, created_at, finished_at, started FROM jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone() if cursor is not None else None
+        if row is None:
+            return None
+        job = Job(json.loads(row[0]), id=job_id, created_at=row[1])
+        job.finished_at = row[2]
+        job.started = row[3]
+        if job.finished_at is not None:
+            cursor = self._execute('SELECT url, result FROM job_results WHERE job_id = ?', (job_id,))
+            for url, result in (cursor.fetchall() if cursor is not None else ()):
+                job.results[url] = self._codec.decode(result)
+            if len(job.results) < len(job.urls):
+                # Only part of the results could be read back
+                job.finished_at = None
+        return job
+
+    def purge(self, finished_before, created_before):
+        """
+        Deletes jobs finished before finished_before, and jobs created before
+        created_before whether or not they finished.
+        """
+        expired = 'SELECT id FROM jobs WHERE finished_at < ? OR created_at < ?'
+        self._execute(f'DELETE FROM job_results WHERE job_id IN ({expired})', (finished_before, created_before))
+        self._execute(f'DELETE FROM jobs WHERE id IN ({expired})', (finished_before, created_before))
+
+
+class JobQueue:
+    """
+    Runs extractions in a bounded background executor so slow sites do not
+    tie up web workers. render(url, outcome, value) turns each URL's outcome
+    ('done' and the payload, or 'failed' and the exception) into the result
+    clients poll for. With a JobStore the results are kept host-wide and any
+    worker can answer a poll; without one only the worker that accepted the
+    job knows about it.
+    """
+
+    def __init__(self, resolve, render, workers=JOBS_WORKERS, max_pending=JOBS_MAX_PENDING, store=None):
+        self._resolve = resolve
+        self._render = render
+        self._store = store
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._max_pending = max_pending
+        self._jobs = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, urls):
+        with self._lock:
+            self._purge_finished()
+            if self._pending + len(urls) > self._max_pending:
+                raise QueueFullError("Too many extraction jobs are pending, try again later.")
+            job = Job(urls)
+            self._jobs[job.id] = job
+            self._pending += len(urls)
+        if self._store is not None:
+            now = time.time()
+            self._store.purge(now - JOBS_RETENTION, now - JOBS_MAX_AGE)
+            self._store.create(job)
+        for url in urls:
+            self._executor.submit(self._run, job, url)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self._store is not None:
+            # Accepted by another worker
+            job = self._store.load(job_id)
+        return job
+
+    def _run(self, job, url):
+        with self._lock:
+            job.started += 1
+        if self._store is not None:
+            self._store.start(job)
+        try:
+            outcome = ('done', self._resolve(url))
+        except Exception as e:
+            logging.error(f"Job {job.id} failed for URL {url}: {e}")
+            outcome = ('failed', e)
+        result = self._render(url, *outcome)
+        with self._lock:
+            job.results[url] = result
+            self._pending -= 1
+            if len(job.results) == len(job.urls):
+                job.finished_at = time.time()
+                logging.info(f"Job {job.id} finished {len(job.urls)} URL(s) in {job.finished_at - job.created_at:.2f}s")
+        if self._store is not None:
+            self._store.finish_url(job, url, result)
+
+    def _purge_finished(self):
+        cutoff = time.time() - JOBS_RETENTION
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            return {'jobs': len(self._jobs), 'pending_urls': self._pending}
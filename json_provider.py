@@ -0,0 +1,50 @@
+# json_provider.py
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# "orjson" (used when installed) or "default" for Flask's stdlib-based provider
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson. Keys are sorted, as with Flask's
+    default provider, so responses keep the same shape; types orjson does not
+    know go through Flask's default handler.
+    """
+
+    def dump_bytes(self, obj):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+
+    def dumps(self, obj, **kwargs):
+        return self.dump_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dump_bytes(obj), mimetype=self.mimetype)
+
+
+def install(app):
+    """
+    Switches app to the configured JSON provider.
+    """
+    if JSON_PROVIDER == 'orjson' and orjson is not None:
+        app.json = OrjsonProvider(app)
+
+
+def dump_bytes(app, obj):
+    """
+    Serializes obj with the app's JSON provider, straight to bytes when it can.
+    """
+    if isinstance(app.json, OrjsonProvider):
+        return app.json.dump_bytes(obj)
+    return app.json.dumps(obj).encode('utf-8')
@@ -0,0 +1,79 @@
+# metrics.py
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Under gunicorn every worker (and every extraction process) writes its samples
+# to files in this directory, and /metrics aggregates them. gunicorn.conf.py sets
+# it for every gunicorn run.
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+# Extractions take seconds, cache hits microseconds
+LATENCY_BUCKETS = (.0005, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 20, 30, 60)
+
+REQUESTS = Counter(
+    'video_info_requests_total', 'get_video_info requests by outcome.', ['outcome'])
+REQUEST_SECONDS = Histogram(
+    'video_info_request_seconds', 'Total get_video_info request time.', buckets=LATENCY_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge(
+    'video_info_requests_in_flight', 'get_video_info requests being served.', multiprocess_mode='livesum')
+
+CACHE_LOOKUPS = Counter(
+    'video_info_cache_lookups_total', 'Result cache lookups.', ['result'])
+COALESCED = Counter(
+    'video_info_coalesced_total', 'Requests that waited on an identical in-flight extraction.')
+CACHE_BYTES = Gauge(
+    'video_info_cache_local_bytes', 'Estimated bytes held by the in-process result caches.',
+    multiprocess_mode='livesum')
+CACHE_EVICTIONS = Counter(
+    'video_info_cache_local_evictions_total',
+    'Entries evicted from the in-process cache, or rejected by its admission policy.', ['reason'])
+REFRESHES = Counter(
+    'video_info_cache_refreshes_total',
+    'Background refreshes of entries served within the stale grace window, by result.', ['result'])
+NEGATIVE_HITS = Counter(
+    'video_info_negative_cache_hits_total', 'Requests answered with a cached extraction failure.', ['error_class'])
+NEGATIVE_SAVED_SECONDS = Counter(
+    'video_info_negative_cache_saved_seconds_total',
+    'Extraction time the negative cache saved, based on what the cached failure cost.', ['error_class'])
+HOST_COALESCED = Counter(
+    'video_info_host_coalesced_total',
+    'Extractions another worker on the host was already running, by how the wait ended.', ['result'])
+
+RESPONSE_CACHE = Counter(
+    'video_info_response_cache_total', 'Lookups of already serialized and compressed responses.', ['result'])
+NOT_MODIFIED = Counter(
+    'video_info_not_modified_total', 'Conditional get_video_info requests answered with 304 Not Modified.')
+REDIRECTS = Counter(
+    'video_info_redirects_total', 'GET /r/<token> requests by result.', ['result'])
+
+EXTRACTIONS = Counter(
+    'video_info_extractions_total', 'yt-dlp extractions by extractor and outcome.', ['extractor', 'outcome'])
+EXTRACTIONS_IN_FLIGHT = Gauge(
+    'video_info_extractions_in_flight', 'yt-dlp extractions running.', multiprocess_mode='livesum')
+EXTRACT_SECONDS = Histogram(
+    'video_info_extract_seconds', 'Time spent in extract_info.', ['extractor'], buckets=LATENCY_BUCKETS)
+POSTPROCESS_SECONDS = Histogram(
+    'video_info_postprocess_seconds', 'Time spent filtering and deduplicating formats.', ['extractor'],
+    buckets=LATENCY_BUCKETS)
+
+
+def render():
+    """
+    Returns (body, content_type) for the /metrics endpoint.
+    """
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
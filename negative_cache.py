@@ -0,0 +1,90 @@
+# negative_cache.py
+import os
+import re
+
+import yt_dlp
+
+# How long a failed extraction is remembered, per error class (seconds, 0 disables)
+NEGATIVE_TTLS = {
+    # Removed, private, terminated, unsupported: retrying will not help
+    'permanent': int(os.environ.get('NEGATIVE_TTL_PERMANENT', '3600')),
+    # Geo-blocked, members-only, age-gated, upcoming: may change, but not soon
+    'semi_permanent': int(os.environ.get('NEGATIVE_TTL_SEMI_PERMANENT', '600')),
+    # Rate limits, network trouble, bot checks: only absorb immediate retries
+    'transient': int(os.environ.get('NEGATIVE_TTL_TRANSIENT', '15')),
+}
+
+_PERMANENT_RE = re.compile('|'.join([
+    r'video unavailable',
+    r'video (?:has been|was) removed',
+    r'video (?:is|has been) deleted',
+    r'private video',
+    r'this video is private',
+    r'account associated with this video has been terminated',
+    r'copyright (?:claim|grounds)',
+    r'violat(?:es|ing) .*(?:terms|policy|guidelines)',
+    r'does not exist',
+    r'not found',
+    r'http error 404',
+    r'http error 410',
+    r'unsupported url',
+    r'is not a valid url',
+    r'no video formats found',
+    r'no downloadable formats found',
+]), re.IGNORECASE)
+
+_SEMI_PERMANENT_RE = re.compile('|'.join([
+    r'(?:not|made this video) available in your country',
+    r'geo.?restrict',
+    r'blocked (?:it )?in your country',
+    r'members.only',
+    r'join this channel',
+    r'confirm your age',
+    r'age.restricted',
+    r'inappropriate for some users',
+    r'premieres in',
+    r'live event will begin',
+    r'this live event',
+    r'requires payment',
+    r'purchase',
+    r'login required',
+]), re.IGNORECASE)
+
+
+def classify_error(message):
+    """
+    Sorts a yt-dlp DownloadError message into "permanent", "semi_permanent"
+    or "transient". Anything unrecognised counts as transient, so an unknown
+    failure is never cached for long.
+    """
+    # Bot checks read like "Sign in to confirm you're not a bot" and clear up on their own;
+    # so do 403s, which YouTube returns while throttling an extraction
+    if re.search(r"not a bot|too many requests|http error 429|http error 403|timed out|temporarily",
+                 message, re.IGNORECASE):
+        return 'transient'
+    if _PERMANENT_RE.search(message):
+        return 'permanent'
+    if _SEMI_PERMANENT_RE.search(message):
+        return 'semi_permanent'
+    return 'transient'
+
+
+def negative_entry(message, error_class, cost):
+    """
+    Cache payload recording a failed extraction and what it cost.
+    """
+    return {'negative': {'message': message, 'class': error_class, 'cost': cost}}
+
+
+def is_negative(payload):
+    return 'negative' in payload
+
+
+class CachedDownloadError(yt_dlp.utils.DownloadError):
+    """
+    A DownloadError served from the negative cache instead of a fresh extraction.
+    """
+
+    def __init__(self, entry):
+        super().__init__(entry['message'])
+        self.error_class = entry['class']
@@ -0,0 +1,61 @@
+# refresher.py
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Background threads per worker process re-extracting entries before they expire
+REFRESH_WORKERS = int(os.environ.get('REFRESH_WORKERS', '2'))
+
+
+class Refresher:
+    """
+    Runs cache refreshes in a small background executor, at most one per key
+    at a time. Callers never wait for a refresh; a key already being refreshed
+    is simply skipped.
+    """
+
+    def __init__(self, workers=REFRESH_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='refresh')
+        self._keys = set()
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def schedule(self, key, fn):
+        """
+        Queues fn() to refresh key. Returns False if a refresh of key is
+        already queued or running.
+        """
+        with self._lock:
+            if key in self._keys:
+                self.skipped += 1
+                return False
+            self._keys.add(key)
+            self.scheduled += 1
+        self._executor.submit(self._run, key, fn)
+        return True
+
+    def _run(self, key, fn):
+        try:
+            fn()
+        except Exception as e:
+            logging.warning(f"Background refresh failed for {key}: {e}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._keys.discard(key)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._keys)
+
+    def stats(self):
+        return {
+            'scheduled': self.scheduled,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'in_flight': self.in_flight(),
+        }
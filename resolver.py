@@ -0,0 +1,229 @@
+# resolver.py
+import functools
+import logging
+import time
+
+import yt_dlp
+
+import backends
+import extraction
+import metrics
+import timing
+from host_lock import HOST_LOCK_POLL, HOST_LOCK_WAIT, HostLocks
+from hot_set import HOT_REFRESH_PER_MINUTE, HotRefresher, HotSet
+from negative_cache import NEGATIVE_TTLS, CachedDownloadError, classify_error, is_negative, negative_entry
+from refresher import Refresher
+from shared_cache import SHARED_CACHE_PATH, SharedCache, SharedTokenBucket
+from singleflight import SingleFlight
+from short_urls import find_format_url
+from snapshot import CacheSnapshots
+from video_cache import VideoInfoCache, normalize_url
+
+# Extracted payloads, reused until their direct URLs expire. The shared tier
+# lets every worker on the host serve what any one of them resolved.
+shared_cache = SharedCache(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None
+video_cache = VideoInfoCache(shared=shared_cache)
+# Concurrent requests for the same video share one extraction
+extractions = SingleFlight()
+# ...and so do concurrent requests in different workers, through the shared cache
+host_locks = HostLocks() if SHARED_CACHE_PATH else None
+host_coalesced = {'served': 0, 'timeout': 0}
+negative_saved = {'hits': 0, 'seconds': 0.0}
+# Entries close to expiry are served as-is and re-extracted in the background
+refresher = Refresher()
+
+
+@functools.lru_cache(maxsize=8192)
+def canonicalize(video_url):
+    """
+    Returns (cache_key, canonical_id) for a requested URL. The key is the
+    extractor's (key, video id) identity when one is recognised, so all URL
+    shapes of a video share cache entries and extractions; otherwise it is
+    the normalized URL and canonical_id is None.
+    """
+    canonical_id = extraction.extractor_index.canonical_id(video_url)
+    return canonical_id or normalize_url(video_url), canonical_id
+
+
+def _raise_cached_error(payload):
+    entry = payload['negative']
+    negative_saved['hits'] += 1
+    negative_saved['seconds'] += entry['cost']
+    metrics.NEGATIVE_HITS.labels(entry['class']).inc()
+    metrics.NEGATIVE_SAVED_SECONDS.labels(entry['class']).inc(entry['cost'])
+    timing.note('cache', 'negative_hit')
+    raise CachedDownloadError(entry)
+
+
+def _wait_for_other_worker(cache_key):
+    """
+    Called when another worker holds the host lease for cache_key. Returns
+    (payload, lease): the payload once the other worker has stored it in the
+    shared cache, or a lease of our own if the other worker finished without
+    a result. Both are None if HOST_LOCK_WAIT ran out first.
+    """
+    deadline = time.monotonic() + HOST_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(HOST_LOCK_POLL)
+        payload, _ = video_cache.lookup_shared(cache_key)
+        if payload is not None:
+            return payload, None
+        lease = host_locks.try_acquire(cache_key)
+        if lease is not None:
+            # The holder is done; it may have stored the result just before releasing
+            payload, _ = video_cache.lookup_shared(cache_key)
+            if payload is not None:
+                lease.release()
+                return payload, None
+            return None, lease
+    return None, None
+
+
+def _refresh(video_url, cache_key, canonical_id, seen):
+    """
+    Re-extracts the entry seen by a request (None if it was missing), unless
+    another worker has replaced it already or is doing so right now. A failed
+    refresh leaves the current entry in place until it expires.
+    """
+    _, entry = video_cache.lookup_shared(cache_key)
+    if entry is not None and (seen is None or entry.expires_at > seen.expires_at):
+        metrics.REFRESHES.labels('shared').inc()
+        return
+    lease = host_locks.try_acquire(cache_key) if host_locks else None
+    if host_locks and lease is None:
+        metrics.REFRESHES.labels('busy').inc()
+        return
+    started = time.monotonic()
+    try:
+        with metrics.EXTRACTIONS_IN_FLIGHT.track_inprogress():
+            payload = backends.get_backend().extract(video_url)
+        payload['canonical_id'] = canonical_id
+        video_cache.set(cache_key, payload, cost=time.monotonic() - started)
+        metrics.REFRESHES.labels('refreshed').inc()
+        logging.info(f"Refreshed cached entry for URL: {video_url}")
+    except Exception:
+        metrics.REFRESHES.labels('failed').inc()
+        raise
+    finally:
+        if lease is not None:
+            lease.release()
+
+
+def _schedule_refresh(cache_key, video_url, canonical_id, seen):
+    return refresher.schedule(cache_key, lambda: _refresh(video_url, cache_key, canonical_id, seen))
+
+
+# The most requested videos are re-extracted before they expire, so they never miss;
+# the refresh budget is shared by all workers on the host
+hot_set = HotSet()
+hot_refresher = HotRefresher(hot_set, video_cache, _schedule_refresh, budget=(
+    SharedTokenBucket(shared_cache, 'hot_refresh', HOT_REFRESH_PER_MINUTE) if shared_cache is not None else None))
+# The local tier is saved periodically and at exit, and reloaded on startup,
+# so a restart or deploy does not begin with a cold cache
+snapshots = CacheSnapshots(video_cache)
+snapshots.ensure_started()
+
+
+def resolve_video_info(video_url):
+    """
+    Returns the get_video_info payload for a URL, served from the cache when
+    possible. Concurrent misses for the same video are coalesced into a single
+    yt-dlp extraction. Extraction errors propagate to every waiting caller.
+    """
+    return resolve_versioned(video_url)[0]
+
+
+def resolve_versioned(video_url):
+    """
+    Like resolve_video_info, but returns (payload, version) where version
+    identifies the cache entry the payload belongs to (None if it is not
+    cached), so renderings of the payload can be cached alongside it.
+    """
+    with timing.stage('canonicalize'):
+        cache_key, canonical_id = canonicalize(video_url)
+    hot_set.record(cache_key, video_url, canonical_id)
+    hot_refresher.ensure_started()
+    snapshots.ensure_started()
+    with timing.stage('cache'):
+        cached, tier, entry = video_cache.lookup(cache_key)
+    if cached is not None and is_negative(cached):
+        logging.info(f"Negative cache hit ({cached['negative']['class']}) for URL: {video_url}")
+        _raise_cached_error(cached)
+    if cached is not None:
+        result = 'hit' if tier == 'local' else 'shared_hit'
+        metrics.CACHE_LOOKUPS.labels(result).inc()
+        timing.note('cache', result)
+        logging.info(f"Cache hit ({tier}) for URL: {video_url}")
+        if video_cache.refresh_due(entry):
+            # Still valid for a while: answer now, re-extract behind the client's back
+            if _schedule_refresh(cache_key, video_url, canonical_id, entry):
+                timing.note('refresh', 'scheduled')
+        return cached, entry.expires_at
+    metrics.CACHE_LOOKUPS.labels('miss').inc()
+    timing.note('cache', 'miss')
+
+    def extract():
+        lease = host_locks.try_acquire(cache_key) if host_locks else None
+        if host_locks and lease is None:
+            with timing.stage('host_wait'):
+                payload, lease = _wait_for_other_worker(cache_key)
+            if payload is not None:
+                host_coalesced['served'] += 1
+                metrics.HOST_COALESCED.labels('served').inc()
+                timing.note('cache', 'host_coalesced')
+                logging.info(f"Served URL: {video_url} from another worker's extraction")
+                if is_negative(payload):
+                    _raise_cached_error(payload)
+                return payload, None
+            if lease is None:
+                host_coalesced['timeout'] += 1
+                metrics.HOST_COALESCED.labels('timeout').inc()
+                logging.warning(f"Gave up waiting for another worker to extract URL: {video_url}")
+        started = time.monotonic()
+        try:
+            with metrics.EXTRACTIONS_IN_FLIGHT.track_inprogress():
+                payload = backends.get_backend().extract(video_url)
+            payload['canonical_id'] = canonical_id
+            entry = video_cache.set(cache_key, payload, cost=time.monotonic() - started)
+            return payload, entry.expires_at if entry is not None else None
+        except yt_dlp.utils.DownloadError as e:
+            # Remember the failure so retries do not pay for another extraction
+            error_class = classify_error(str(e))
+            ttl = NEGATIVE_TTLS[error_class]
+            if ttl > 0:
+                video_cache.set(cache_key, negative_entry(str(e), error_class, time.monotonic() - started), ttl=ttl)
+            raise
+        finally:
+            if lease is not None:
+                lease.release()
+
+    (payload, version), shared = extractions.do(cache_key, extract)
+    if shared:
+        metrics.COALESCED.inc()
+        timing.note('cache', 'coalesced')
+        logging.info(f"Coalesced request for URL: {video_url} onto an in-flight extraction")
+    return payload, version
+
+
+def resolve_format_url(cache_key, quality):
+    """
+    Returns the cached direct URL of one format, or None if the video is no
+    longer cached. Costs one cache lookup; nothing is extracted.
+    """
+    payload, _, _ = video_cache.lookup(cache_key)
+    if payload is None or is_negative(payload):
+        return None
+    return find_format_url(payload, quality)
+
+
+def stats():
+    """
+    Counters describing the cache and extraction coalescing.
+    """
+    return {
+        'cache': {**video_cache.stats(), 'snapshot': snapshots.stats()},
+        'negative_cache': {'hits': negative_saved['hits'], 'saved_seconds': round(negative_saved['seconds'], 3)},
+        'extractions': {**extractions.stats(), 'host_coalesced': dict(host_coalesced)},
+        'refreshes': {**refresher.stats(), 'hot_set': hot_refresher.stats()},
+        'backend': backends.get_backend().stats(),
+    }
@@ -0,0 +1,136 @@
+# responses.py
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import zstandard
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+# Bytes of rendered (serialized and compressed) get_video_info bodies kept per worker
+RESPONSE_CACHE_BYTES = int(os.environ.get('RESPONSE_CACHE_BYTES', str(16 * 1024 * 1024)))
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+BROTLI_LEVEL = int(os.environ.get('COMPRESS_BROTLI_LEVEL', '5'))
+ZSTD_LEVEL = int(os.environ.get('COMPRESS_ZSTD_LEVEL', '3'))
+# Longest time clients and proxies may reuse a GET get_video_info response without revalidating
+CLIENT_MAX_AGE = int(os.environ.get('VIDEO_INFO_MAX_AGE', '60'))
+
+_local = threading.local()
+
+
+def _zstd(body):
+    # ZstdCompressor objects must not be shared between threads
+    compressor = getattr(_local, 'zstd', None)
+    if compressor is None:
+        compressor = _local.zstd = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return compressor.compress(body)
+
+
+# Supported encodings, most preferred first
+COMPRESSORS = OrderedDict([('zstd', _zstd)])
+if brotli is not None:
+    COMPRESSORS['br'] = lambda body: brotli.compress(body, quality=BROTLI_LEVEL)
+COMPRESSORS['gzip'] = lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def negotiate(accept_encoding):
+    """
+    Picks the encoding to use for an Accept-Encoding header, or None for
+    identity. Among the encodings the client accepts, the one with the
+    highest q-value wins, and ties go to the order of COMPRESSORS.
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for name in COMPRESSORS:
+        q = accepted.get(name, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def etag(body):
+    """
+    Weak ETag value for a serialized (uncompressed) body. Serialization sorts
+    keys, so every worker derives the same tag for the same payload.
+    """
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def compress(body, encoding):
+    """
+    Returns (encoding, body) for a response body: compressed with the
+    negotiated encoding, or unchanged (encoding None) below COMPRESS_MIN_BYTES.
+    """
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return None, body
+    return encoding, COMPRESSORS[encoding](body)
+
+
+class ResponseCache:
+    """
+    Byte-bounded LRU of rendered response bodies. Each body is stored with the
+    version of the cache entry it was rendered from and is only served for
+    that version, so a refreshed entry is rendered afresh.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES):
+        self._max_bytes = max_bytes
+        self._bodies = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        """
+        Returns (encoding, body, etag) rendered for this version of key, or None.
+        """
+        with self._lock:
+            item = self._bodies.get(key)
+            if item is not None and item[0] == version:
+                self._bodies.move_to_end(key)
+                self.hits += 1
+                return item[1:]
+            self.misses += 1
+            return None
+
+    def put(self, key, version, encoding, body, etag):
+        with self._lock:
+            old = self._bodies.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[2])
+            if len(body) > self._max_bytes:
+                return
+            self._bodies[key] = (version, encoding, body, etag)
+            self._bytes += len(body)
+            while self._bytes > self._max_bytes:
+                _, evicted = self._bodies.popitem(last=False)
+                self._bytes -= len(evicted[2])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._bodies),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
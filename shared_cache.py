@@ -0,0 +1,195 @@
+# shared_cache.py
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from codec import PayloadCodec, UnknownDictionaryError
+
+# SQLite file shared by all gunicorn workers on the host; set to an empty string to disable
+SHARED_CACHE_PATH = os.environ.get(
+    'SHARED_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'video_info_cache.sqlite3'))
+# Delete expired rows after this many writes
+PURGE_EVERY = 500
+
+
+def thread_connection(local, path):
+    """
+    Returns the calling thread's connection to the SQLite file at path, in
+    WAL mode, kept in the threading.local local.
+    """
+    # sqlite3 connections must not be shared between threads (or forked processes)
+    conn = getattr(local, 'conn', None)
+    if conn is None or local.pid != os.getpid():
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        local.conn = conn
+        local.pid = os.getpid()
+    return conn
+
+
+class SharedCache:
+    """
+    Host-wide store of get_video_info payloads in an SQLite database in WAL
+    mode, so a payload resolved by one worker can be served by all of them.
+    Each entry keeps the expiry computed by the worker that stored it.
+
+    Payloads are stored as zstd-compressed msgpack. The compression dictionary
+    a worker trains is kept in the database, and a worker about to train uses
+    a stored one instead; only workers that train at the same moment each
+    store their own, all of which stay readable by every worker.
+    """
+
+    def __init__(self, path=SHARED_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._init_schema()
+        self.codec = PayloadCodec(on_trained=self._store_dictionary, load_trained=self._load_dictionaries)
+        self._load_dictionaries()
+
+    def _connection(self):
+        return thread_connection(self._local, self.path)
+
+    def _init_schema(self):
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY,'
+            ' expires_at REAL NOT NULL,'
+            ' payload BLOB NOT NULL,'
+            ' cost REAL NOT NULL DEFAULT 0)')
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS dictionaries ('
+            ' id INTEGER PRIMARY KEY,'
+            ' data BLOB NOT NULL)')
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS budgets ('
+            ' name TEXT PRIMARY KEY,'
+            ' tokens REAL NOT NULL,'
+            ' updated_at REAL NOT NULL)')
+        columns = [row[1] for row in self._connection().execute('PRAGMA table_info(entries)')]
+        if 'cost' not in columns:
+            # Databases created before extraction costs were stored
+            try:
+                self._connection().execute('ALTER TABLE entries ADD COLUMN cost REAL NOT NULL DEFAULT 0')
+            except sqlite3.OperationalError:
+                # Another worker added it first
+                pass
+
+    def _load_dictionaries(self):
+        """
+        Loads every stored dictionary for decoding, and encodes with the newest.
+        Returns whether any was found.
+        """
+        try:
+            rows = self._connection().execute('SELECT id, data FROM dictionaries ORDER BY rowid').fetchall()
+        except sqlite3.Error as e:
+            logging.warning(f"Could not load shared cache dictionaries: {e}")
+            return False
+        for i, (_, data) in enumerate(rows):
+            self.codec.add_dictionary(data, use=i == len(rows) - 1)
+        return bool(rows)
+
+    def _store_dictionary(self, data):
+        dict_id = self.codec.add_dictionary(data)
+        try:
+            self._connection().execute('INSERT OR IGNORE INTO dictionaries (id, data) VALUES (?, ?)', (dict_id, data))
+        except sqlite3.Error as e:
+            logging.warning(f"Could not store shared cache dictionary: {e}")
+            return
+        logging.info(f"Trained shared cache dictionary {dict_id} ({len(data)} bytes)")
+
+    def encode(self, payload):
+        return self.codec.encode(payload)
+
+    def decode(self, data):
+        try:
+            return self.codec.decode(data)
+        except UnknownDictionaryError:
+            # Trained by another worker since we started
+            self._load_dictionaries()
+            return self.codec.decode(data)
+
+    def get(self, key):
+        """
+        Returns (expires_at, payload, cost) for an unexpired entry, or None.
+        """
+        try:
+            row = self._connection().execute(
+                'SELECT expires_at, payload, cost FROM entries WHERE key = ? AND expires_at > ?',
+                (key, time.time())).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache read failed for {key}: {e}")
+            return None
+        if row is None:
+            return None
+        try:
+            payload = self.decode(row[1])
+        except Exception as e:
+            logging.warning(f"Shared cache entry for {key} could not be decoded: {e}")
+            return None
+        return row[0], payload, row[2]
+
+    def set(self, key, expires_at, payload, cost=0.0):
+        try:
+            conn = self._connection()
+            conn.execute('INSERT OR REPLACE INTO entries (key, expires_at, payload, cost) VALUES (?, ?, ?, ?)',
+                         (key, expires_at, self.encode(payload), cost))
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                conn.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),))
+        except sqlite3.Error as e:
+            logging.warning(f"Shared cache write failed for {key}: {e}")
+
+    def add_tokens(self, name, count, per_second, capacity):
+        """
+        Refills the named token bucket for the time since it was last used and
+        adds count tokens (negative to take them). Returns False, changing
+        nothing, if that would leave fewer than zero.
+        """
+        conn = self._connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = conn.execute('SELECT tokens, updated_at FROM budgets WHERE name = ?', (name,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + max(now - row[1], 0.0) * per_second)
+                added = tokens + count >= 0
+                if added:
+                    tokens = min(capacity, tokens + count)
+                conn.execute('INSERT OR REPLACE INTO budgets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                             (name, tokens, now))
+            finally:
+                conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            logging.warning(f"Shared budget {name} could not be updated: {e}")
+            return False
+        return added
+
+    def clear(self):
+        self._connection().execute('DELETE FROM entries')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+
+class SharedTokenBucket:
+    """
+    Budget of per_minute takes a minute for all workers on the host together,
+    kept as a row of the shared cache database.
+    """
+
+    def __init__(self, shared, name, per_minute):
+        self._shared = shared
+        self._name = name
+        self._rate = per_minute / 60.0
+        self._capacity = max(per_minute, 1.0)
+
+    def take(self):
+        return self._shared.add_tokens(self._name, -1, self._rate, self._capacity)
+
+    def refund(self):
+        self._shared.add_tokens(self._name, 1, self._rate, self._capacity)
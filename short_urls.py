@@ -0,0 +1,48 @@
+# short_urls.py
+import base64
+import binascii
+
+
+def make_token(cache_key, quality):
+    """
+    Opaque token naming one format of a cached payload. Formats are named by
+    their quality label, which is unique within a payload and survives a
+    refresh reordering them. Only issued for canonical (extractor, video id)
+    keys, which keeps tokens short and free of page URLs.
+    """
+    raw = f"{cache_key}\n{quality}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def parse_token(token):
+    """
+    Returns (cache_key, quality) for a token, or None if it is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+    except (binascii.Error, ValueError):
+        return None
+    cache_key, sep, quality = raw.partition('\n')
+    if not sep or not cache_key:
+        return None
+    return cache_key, quality
+
+
+def shorten(payload, canonical_id):
+    """
+    Returns a copy of a get_video_info payload cached under canonical_id whose
+    formats carry a "token" for GET /r/<token> instead of the direct "url".
+    """
+    formats = []
+    for f in payload['formats']:
+        short = {k: v for k, v in f.items() if k != 'url'}
+        short['token'] = make_token(canonical_id, f['quality'])
+        formats.append(short)
+    return {**payload, 'formats': formats}
+
+
+def find_format_url(payload, quality):
+    for f in payload.get('formats', []):
+        if f['quality'] == quality:
+            return f['url']
+    return None
@@ -0,0 +1,215 @@
+# snapshot.py
+import atexit
+import fcntl
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+
+import zstandard
+
+from codec import CODEC_TRAIN_SAMPLES, PayloadCodec
+from video_cache import Entry
+
+# Base name of the files the in-process cache is saved to and restored from; each worker
+# saves to <path>.<slot> and restores from all of them. Set to an empty string to disable
+SNAPSHOT_PATH = os.environ.get(
+    'CACHE_SNAPSHOT_PATH', os.path.join(tempfile.gettempdir(), 'video_info_cache.snapshot'))
+# Seconds between periodic snapshots (0 saves only on shutdown)
+SNAPSHOT_INTERVAL = float(os.environ.get('CACHE_SNAPSHOT_INTERVAL', '300'))
+
+_MAGIC = b'VICSNAP2'
+# Length of the compression dictionary that follows the magic (0 for none)
+_DICT_LENGTH = struct.Struct('<I')
+# expires_at, cost, key length, payload length
+_RECORD = struct.Struct('<ddII')
+
+
+def _snapshot_codec(items):
+    # Each snapshot carries a dictionary trained on its own entries
+    codec = PayloadCodec(train_samples=0)
+    samples = [codec.pack(entry.payload) for _, entry in items[:CODEC_TRAIN_SAMPLES]]
+    if len(samples) >= 10:
+        try:
+            codec.train(samples)
+        except zstandard.ZstdError:
+            pass
+    return codec
+
+
+def write_snapshot(path, items):
+    """
+    Writes [(key, Entry)] to path as length-prefixed records of compressed
+    payloads, replacing the previous snapshot atomically. Returns the number
+    of entries written.
+    """
+    codec = _snapshot_codec(items)
+    dictionary = codec.dictionary or b''
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.snapshot-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_MAGIC)
+            f.write(_DICT_LENGTH.pack(len(dictionary)))
+            f.write(dictionary)
+            for key, entry in items:
+                key_bytes = key.encode('utf-8')
+                payload = codec.encode(entry.payload)
+                f.write(_RECORD.pack(entry.expires_at, entry.cost, len(key_bytes), len(payload)))
+                f.write(key_bytes)
+                f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return len(items)
+
+
+def read_snapshot(path, now=None):
+    """
+    Yields (key, Entry) from a snapshot file, streaming it record by record
+    and skipping (without decoding) entries that have expired.
+    """
+    now = time.time() if now is None else now
+    with open(path, 'rb') as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"{path} is not a cache snapshot")
+        (dict_length,) = _DICT_LENGTH.unpack(f.read(_DICT_LENGTH.size))
+        codec = PayloadCodec(f.read(dict_length) or None, train_samples=0)
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            expires_at, cost, key_length, payload_length = _RECORD.unpack(header)
+            if expires_at <= now:
+                f.seek(key_length + payload_length, os.SEEK_CUR)
+                continue
+            key = f.read(key_length).decode('utf-8')
+            data = f.read(payload_length)
+            if len(data) < payload_length:
+                # Truncated file; keep what was read so far
+                return
+            yield key, Entry(expires_at, codec.decode(data), cost)
+
+
+class CacheSnapshots:
+    """
+    Saves a VideoInfoCache's local tier every SNAPSHOT_INTERVAL seconds and
+    at exit, and restores it in a background thread when a process starts,
+    so serving never waits for the load.
+
+    Each worker holds only the entries it served, so each one claims a slot
+    (the lowest free one, locked for as long as it lives) and saves to that
+    slot's file; a starting worker restores the files of every slot.
+    """
+
+    def __init__(self, cache, path=SNAPSHOT_PATH, interval=SNAPSHOT_INTERVAL):
+        self._cache = cache
+        self._path = path
+        self._interval = interval
+        self._pid = None
+        self._slot = None
+        self._lock = threading.Lock()
+        # Saving before the restore finished would overwrite a full snapshot with a partial one
+        self._ready = threading.Event()
+        self.restored = 0
+        self.saved = 0
+        self.last_save_seconds = None
+
+    def ensure_started(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        if self._pid == os.getpid() or not self._path:
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                if self._pid is None:
+                    # Forked children inherit the handler
+                    atexit.register(self.save)
+                self._pid = os.getpid()
+                self._ready = threading.Event()
+                threading.Thread(target=self._run, name='cache-snapshot', daemon=True).start()
+
+    def _claim_slot(self):
+        """
+        Locks the lowest free worker slot until this process exits and returns its number.
+        """
+        slot = 0
+        while True:
+            fd = os.open(f"{self._path}.{slot}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                slot += 1
+                continue
+            # Left open: the kernel releases the slot when the process exits
+            return slot
+
+    def _slot_paths(self):
+        """
+        Snapshot files of all slots, this process's own first.
+        """
+        directory = os.path.dirname(self._path) or '.'
+        prefix = os.path.basename(self._path) + '.'
+        slots = [int(name[len(prefix):]) for name in os.listdir(directory)
+                 if name.startswith(prefix) and name[len(prefix):].isdigit()]
+        return [f"{self._path}.{slot}" for slot in sorted(slots, key=lambda slot: (slot != self._slot, slot))]
+
+    def _run(self):
+        try:
+            self._slot = self._claim_slot()
+        except OSError as e:
+            logging.warning(f"Could not claim a cache snapshot slot for {self._path}: {e}")
+            return
+        try:
+            self.restore()
+        finally:
+            self._ready.set()
+        while self._interval > 0:
+            time.sleep(self._interval)
+            self.save()
+
+    def restore(self):
+        started = time.monotonic()
+        restored = 0
+        try:
+            paths = self._slot_paths()
+        except OSError as e:
+            logging.warning(f"Could not list cache snapshots for {self._path}: {e}")
+            return
+        for path in paths:
+            try:
+                for key, entry in read_snapshot(path):
+                    if self._cache.restore(key, entry):
+                        restored += 1
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError, struct.error, zstandard.ZstdError) as e:
+                logging.warning(f"Could not restore cache snapshot {path}: {e}")
+        self.restored += restored
+        logging.info(f"Restored {restored} cache entries from {len(paths)} snapshot(s) of {self._path} "
+                     f"in {time.monotonic() - started:.3f}s")
+
+    def save(self):
+        # Only the process running the snapshot thread, once its restore is done
+        if self._pid != os.getpid() or not self._ready.is_set():
+            return
+        started = time.monotonic()
+        path = f"{self._path}.{self._slot}"
+        try:
+            self.saved = write_snapshot(path, self._cache.items())
+        except OSError as e:
+            logging.warning(f"Could not save cache snapshot {path}: {e}")
+            return
+        self.last_save_seconds = round(time.monotonic() - started, 3)
+
+    def stats(self):
+        return {
+            'path': self._path or None,
+            'slot': self._slot,
+            'restored': self.restored,
+            'saved': self.saved,
+            'last_save_seconds': self.last_save_seconds,
+        }
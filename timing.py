@@ -0,0 +1,74 @@
+# timing.py
+import contextvars
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+# Add a Server-Timing header to get_video_info responses (set to 0 to disable)
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') != '0'
+
+_current = contextvars.ContextVar('stage_timer', default=None)
+_untimed = nullcontext()
+
+
+class StageTimer:
+    """
+    Collects per-stage durations for one request.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.notes = {}
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def header(self):
+        return ', '.join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items())
+
+    def breakdown(self):
+        return {
+            'stages_ms': {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+            **self.notes,
+        }
+
+
+def start():
+    """
+    Starts timing the current request. Returns (timer, token); pass the token
+    to stop() when the request is done.
+    """
+    timer = StageTimer()
+    return timer, _current.set(timer)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def stage(name):
+    """
+    Context manager timing a stage of the current request; a shared no-op
+    when the request is not being timed.
+    """
+    timer = _current.get()
+    if timer is None:
+        return _untimed
+    return timer.stage(name)
+
+
+def note(name, value):
+    """
+    Attaches a detail (extractor key, cache result) to the current request's breakdown.
+    """
+    timer = _current.get()
+    if timer is not None:
+        timer.notes[name] = value
@@ -0,0 +1,214 @@
+# tinylfu.py
+import sys
+from collections import OrderedDict
+
+# Share of the byte budget given to the admission window, and of the main
+# area given to the protected segment (the W-TinyLFU paper's defaults)
+WINDOW_SHARE = 0.01
+PROTECTED_SHARE = 0.8
+# Rough size of a cached payload, used to size the frequency sketch
+TYPICAL_ENTRY_BYTES = 16 * 1024
+
+
+def estimate_size(value):
+    """
+    Approximate memory held by a JSON-like value, in bytes. Cheaper than
+    sys.getsizeof on every node and close enough for budgeting.
+    """
+    if isinstance(value, str):
+        return 49 + len(value)
+    if isinstance(value, dict):
+        return 64 + 24 * len(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + 8 * len(value) + sum(estimate_size(v) for v in value)
+    if value is None or isinstance(value, bool):
+        return 0
+    if hasattr(value, 'nbytes'):
+        # Compact records account for their own shared parts
+        return value.nbytes()
+    return sys.getsizeof(value)
+
+
+class CountMinSketch:
+    """
+    Approximate access counts in four rows of small saturating counters.
+    All counters are halved every sample_size increments, so old popularity
+    fades and the sketch tracks recent traffic.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+    _SEEDS = (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F)
+
+    def __init__(self, width):
+        self._width = 1 << max(width - 1, 1).bit_length()
+        self._mask = self._width - 1
+        self._rows = [[0] * self._width for _ in range(self.DEPTH)]
+        self._sample_size = 10 * self._width
+        self._additions = 0
+
+    def _indexes(self, key):
+        h = hash(key)
+        return [((h ^ seed) * 0x01000193 >> 8) & self._mask for seed in self._SEEDS]
+
+    def frequency(self, key):
+        return min(row[i] for row, i in zip(self._rows, self._indexes(key)))
+
+    def increment(self, key):
+        indexes = self._indexes(key)
+        current = min(row[i] for row, i in zip(self._rows, indexes))
+        if current >= self.MAX_COUNT:
+            return
+        # Conservative update: only raise the counters that hold the minimum
+        for row, i in zip(self._rows, indexes):
+            if row[i] == current:
+                row[i] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._reset()
+
+    def _reset(self):
+        for row in self._rows:
+            for i, count in enumerate(row):
+                row[i] = count >> 1
+        self._additions //= 2
+
+    def clear(self):
+        for row in self._rows:
+            row[:] = [0] * self._width
+        self._additions = 0
+
+
+class TinyLFUCache:
+    """
+    Byte-bounded W-TinyLFU cache (not thread-safe). New entries enter a small
+    LRU window; an entry pushed out of the window only gets into the main
+    segmented LRU if the sketch says it is requested more often than the
+    entry it would evict, so a burst of one-off keys cannot flush the
+    popular ones.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._window_max = max(int(max_bytes * WINDOW_SHARE), 1)
+        self._protected_max = int((max_bytes - self._window_max) * PROTECTED_SHARE)
+        self._sketch = CountMinSketch(max(8 * max_bytes // TYPICAL_ENTRY_BYTES, 256))
+        # key -> (value, size), least recently used first
+        self._window = OrderedDict()
+        self._probation = OrderedDict()
+        self._protected = OrderedDict()
+        self._window_bytes = 0
+        self._probation_bytes = 0
+        self._protected_bytes = 0
+        self.evictions = 0
+        self.rejections = 0
+
+    @property
+    def bytes(self):
+        return self._window_bytes + self._probation_bytes + self._protected_bytes
+
+    def __len__(self):
+        return len(self._window) + len(self._probation) + len(self._protected)
+
+    def __contains__(self, key):
+        return key in self._window or key in self._probation or key in self._protected
+
+    def items(self):
+        """
+        Returns [(key, value)], roughly most valuable first: protected, then
+        probation, then window, each most recently used first.
+        """
+        return [(key, item[0]) for segment in (self._protected, self._probation, self._window)
+                for key, item in reversed(segment.items())]
+
+    def peek(self, key):
+        """
+        Returns the value for key without counting an access, or None.
+        """
+        for segment in (self._window, self._probation, self._protected):
+            item = segment.get(key)
+            if item is not None:
+                return item[0]
+        return None
+
+    def get(self, key):
+        self._sketch.increment(key)
+        if key in self._window:
+            self._window.move_to_end(key)
+            return self._window[key][0]
+        if key in self._protected:
+            self._protected.move_to_end(key)
+            return self._protected[key][0]
+        item = self._probation.pop(key, None)
+        if item is None:
+            return None
+        # A second hit while on probation earns a place in the protected segment
+        self._probation_bytes -= item[1]
+        self._protected[key] = item
+        self._protected_bytes += item[1]
+        while self._protected_bytes > self._protected_max and len(self._protected) > 1:
+            demoted_key, demoted = self._protected.popitem(last=False)
+            self._protected_bytes -= demoted[1]
+            self._probation[demoted_key] = demoted
+            self._probation_bytes += demoted[1]
+        return item[0]
+
+    def put(self, key, value, size):
+        self._sketch.increment(key)
+        self.pop(key)
+        if size > self.max_bytes - self._window_max:
+            # Could never fit in the main area
+            self.rejections += 1
+            return
+        self._window[key] = (value, size)
+        self._window_bytes += size
+        while self._window_bytes > self._window_max and self._window:
+            candidate_key, candidate = self._window.popitem(last=False)
+            self._window_bytes -= candidate[1]
+            self._admit(candidate_key, candidate)
+
+    def _admit(self, key, item):
+        size = item[1]
+        main_max = self.max_bytes - self._window_max
+        # Candidates that would be evicted to make room, least recently used first
+        victims = []
+        freed = 0
+        main_bytes = self._probation_bytes + self._protected_bytes
+        if main_bytes + size > main_max:
+            candidate_frequency = self._sketch.frequency(key)
+            for segment in (self._probation, self._protected):
+                for victim_key, victim in segment.items():
+                    if main_bytes - freed + size <= main_max:
+                        break
+                    if self._sketch.frequency(victim_key) >= candidate_frequency:
+                        self.rejections += 1
+                        return
+                    victims.append(victim_key)
+                    freed += victim[1]
+        for victim_key in victims:
+            self.pop(victim_key)
+            self.evictions += 1
+        self._probation[key] = item
+        self._probation_bytes += size
+
+    def pop(self, key):
+        item = self._window.pop(key, None)
+        if item is not None:
+            self._window_bytes -= item[1]
+            return item[0]
+        item = self._probation.pop(key, None)
+        if item is not None:
+            self._probation_bytes -= item[1]
+            return item[0]
+        item = self._protected.pop(key, None)
+        if item is not None:
+            self._protected_bytes -= item[1]
+            return item[0]
+        return None
+
+    def clear(self):
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+        self._window_bytes = self._probation_bytes = self._protected_bytes = 0
+        self._sketch.clear()
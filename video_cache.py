@@ -0,0 +1,273 @@
+# video_cache.py
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit, parse_qs
+
+import metrics
+from compact import pack, unpack
+from tinylfu import TinyLFUCache, estimate_size
+
+# TTL used when none of the format URLs carry an expiry (seconds)
+DEFAULT_TTL = int(os.environ.get('VIDEO_CACHE_DEFAULT_TTL', '300'))
+# Never keep an entry longer than this, even if the URLs are valid for longer
+MAX_TTL = int(os.environ.get('VIDEO_CACHE_MAX_TTL', '3600'))
+# Estimated bytes of payloads kept in each worker's in-process cache, in front of the shared cache
+LOCAL_MAX_BYTES = int(os.environ.get('VIDEO_CACHE_LOCAL_BYTES', str(64 * 1024 * 1024)))
+# Stop serving an entry this long before its direct URLs expire, so the
+# client still has time to actually start the download
+EXPIRY_MARGIN = int(os.environ.get('VIDEO_CACHE_EXPIRY_MARGIN', '120'))
+# Entries this close to expiry are still served, but refreshed in the background
+STALE_GRACE = int(os.environ.get('VIDEO_CACHE_STALE_GRACE', '120'))
+# XFetch: refresh ahead of the grace window at random, by on average this many
+# times the entry's extraction cost, so entries stored together do not all come
+# due together (0 disables)
+XFETCH_BETA = float(os.environ.get('VIDEO_CACHE_XFETCH_BETA', '1.0'))
+
+# googlevideo manifest URLs carry the expiry as a path segment: /expire/1700000000/
+_PATH_EXPIRE_RE = re.compile(r'/expire/(\d{9,11})(?:/|$)')
+# Query parameters that hold an absolute unix expiry timestamp
+_EXPIRE_PARAMS = ('expire', 'Expires', 'expires')
+
+# cost is how long the extraction that produced the payload took, in seconds
+Entry = namedtuple('Entry', ['expires_at', 'payload', 'cost'])
+
+
+def normalize_url(url):
+    """
+    Returns a normalized form of a video URL, used as the cache key.
+    Lowercases scheme and host, drops "www."/"m." prefixes, the fragment
+    and a trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'https').lower()
+    if scheme == 'http':
+        scheme = 'https'
+    host = parts.netloc.lower()
+    for prefix in ('www.', 'm.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, parts.query, ''))
+
+
+def url_expiry(url):
+    """
+    Returns the unix timestamp at which a signed direct URL expires,
+    or None if the URL does not say.
+    """
+    parts = urlsplit(url)
+    if parts.query:
+        query = parse_qs(parts.query)
+        for name in _EXPIRE_PARAMS:
+            value = query.get(name)
+            if value and value[0].isdigit():
+                return int(value[0])
+    match = _PATH_EXPIRE_RE.search(parts.path)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def payload_expiry(payload, now=None):
+    """
+    Returns the time until which a payload may be served: the earliest expiry
+    of its format URLs minus EXPIRY_MARGIN, capped at MAX_TTL.
+    """
+    now = time.time() if now is None else now
+    expiries = [url_expiry(f['url']) for f in payload.get('formats', []) if f.get('url')]
+    expiries = [e for e in expiries if e is not None]
+    if not expiries:
+        return now + DEFAULT_TTL
+    return min(min(expiries) - EXPIRY_MARGIN, now + MAX_TTL)
+
+
+class VideoInfoCache:
+    """
+    Thread-safe cache of get_video_info payloads. Each entry lives until its
+    direct URLs are about to expire.
+
+    A per-worker W-TinyLFU cache, bounded by estimated payload bytes, sits in
+    front of an optional host-wide SharedCache, so a payload resolved by any
+    worker can be served by every other one.
+    """
+
+    def __init__(self, shared=None, max_bytes=LOCAL_MAX_BYTES):
+        self._entries = TinyLFUCache(max_bytes)
+        self._lock = threading.Lock()
+        self._shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.early_refreshes = 0
+
+    def lookup(self, key):
+        """
+        Returns (payload, tier, entry) where tier is "local", "shared" or None
+        on a miss, and entry is the stored Entry. The payload is a fresh dict.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self.hits += 1
+                else:
+                    self._entries.pop(key)
+                    entry = None
+        if entry is not None:
+            return unpack(entry.payload), 'local', entry
+
+        if self._shared is not None:
+            found = self._shared.get(key)
+            if found is not None:
+                entry = Entry(*found)
+                self._store_local(key, entry)
+                with self._lock:
+                    self.shared_hits += 1
+                return entry.payload, 'shared', entry
+
+        with self._lock:
+            self.misses += 1
+        return None, None, None
+
+    def get(self, key):
+        return self.lookup(key)[0]
+
+    def refresh_due(self, entry, now=None):
+        """
+        Whether an entry should be refreshed in the background: always once
+        it is within STALE_GRACE of expiry, and before that with XFetch's
+        probability, which rises as the grace window nears and with the cost
+        of the extraction that produced it.
+        """
+        now = time.time() if now is None else now
+        soft_expiry = entry.expires_at - STALE_GRACE
+        if now >= soft_expiry:
+            return True
+        if XFETCH_BETA > 0 and entry.cost > 0:
+            # 1 - random() is in (0, 1], so the log is finite
+            if now - entry.cost * XFETCH_BETA * math.log(1.0 - random.random()) >= soft_expiry:
+                with self._lock:
+                    self.early_refreshes += 1
+                return True
+        return False
+
+    def lookup_shared(self, key):
+        """
+        Reads only the shared tier (promoting a hit into the local cache),
+        without touching the hit/miss counters. Returns (payload, entry), both
+        None on a miss.
+        """
+        if self._shared is None:
+            return None, None
+        found = self._shared.get(key)
+        if found is None:
+            return None, None
+        entry = Entry(*found)
+        self._store_local(key, entry)
+        return entry.payload, entry
+
+    def peek(self, key):
+        """
+        Returns the unexpired Entry for key from either tier, or None, without
+        touching the hit/miss counters or the access frequencies.
+        """
+        with self._lock:
+            entry = self._entries.peek(key)
+        if entry is not None and entry.expires_at > time.time():
+            return entry._replace(payload=unpack(entry.payload))
+        if self._shared is not None:
+            found = self._shared.get(key)
+            if found is not None:
+                return Entry(*found)
+        return None
+
+    def items(self):
+        """
+        Returns [(key, Entry)] for the unexpired entries of the local tier.
+        """
+        now = time.time()
+        with self._lock:
+            items = [(key, entry) for key, entry in self._entries.items() if entry.expires_at > now]
+        return [(key, entry._replace(payload=unpack(entry.payload))) for key, entry in items]
+
+    def restore(self, key, entry):
+        """
+        Loads an entry saved by an earlier process, unless the key was stored
+        since. Returns whether it was loaded.
+        """
+        if entry.expires_at <= time.time():
+            return False
+        with self._lock:
+            if self._entries.peek(key) is not None:
+                return False
+        self._store_local(key, entry)
+        if self._shared is not None and self._shared.get(key) is None:
+            self._shared.set(key, entry.expires_at, entry.payload, entry.cost)
+        return True
+
+    def set(self, key, payload, ttl=None, cost=0.0):
+        """
+        Stores a payload until its URLs are about to expire, or for ttl
+        seconds if given (for entries without URLs, such as cached errors).
+        cost is the extraction time that produced it. Returns the stored
+        Entry, or None if the payload was not worth caching.
+        """
+        now = time.time()
+        expires_at = payload_expiry(payload, now) if ttl is None else now + ttl
+        if expires_at <= now:
+            # The URLs are already (nearly) expired, caching would not help
+            return None
+        entry = Entry(expires_at, payload, cost)
+        self._store_local(key, entry)
+        if self._shared is not None:
+            self._shared.set(key, expires_at, payload, cost)
+        return entry
+
+    def _store_local(self, key, entry):
+        # Kept as compact records; the response dict is rebuilt on each hit
+        entry = entry._replace(payload=pack(entry.payload))
+        size = estimate_size(entry.payload)
+        with self._lock:
+            evictions, rejections = self._entries.evictions, self._entries.rejections
+            self._entries.put(key, entry, size)
+            evicted = self._entries.evictions - evictions
+            rejected = self._entries.rejections - rejections
+            metrics.CACHE_BYTES.set(self._entries.bytes)
+        if evicted:
+            metrics.CACHE_EVICTIONS.labels('evicted').inc(evicted)
+        if rejected:
+            metrics.CACHE_EVICTIONS.labels('rejected').inc(rejected)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._shared is not None:
+            self._shared.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._entries.bytes,
+            'max_bytes': self._entries.max_bytes,
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'local_hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'hit_ratio': round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+            'evictions': self._entries.evictions,
+            'rejections': self._entries.rejections,
+            'early_refreshes': self.early_refreshes,
+            'shared_entries': len(self._shared) if self._shared is not None else None,
+            'shared_codec': self._shared.codec.stats() if self._shared is not None else None,
+        }
@@ -0,0 +1,127 @@
+# ydl_pool.py
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import yt_dlp
+
+import timing
+
+# Maximum number of YoutubeDL instances alive at once in this process
+POOL_SIZE = int(os.environ.get('YDL_POOL_SIZE', '4'))
+# Rebuild an instance after it has served this many extractions...
+POOL_MAX_USES = int(os.environ.get('YDL_POOL_MAX_USES', '100'))
+# ...or after it has been alive for this many seconds
+POOL_MAX_AGE = int(os.environ.get('YDL_POOL_MAX_AGE', '600'))
+
+
+class _PooledYDL:
+    def __init__(self, opts, ydl_class):
+        self.ydl = ydl_class(dict(opts))
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+
+class YoutubeDLPool:
+    """
+    Bounded, thread-safe pool of pre-built YoutubeDL objects.
+
+    A YoutubeDL is not safe to share between threads, so each checkout gets
+    exclusive use of one instance. Instances are reset between checkouts and
+    rebuilt after POOL_MAX_USES extractions or POOL_MAX_AGE seconds.
+    """
+
+    def __init__(self, opts, size=POOL_SIZE, max_uses=POOL_MAX_USES, max_age=POOL_MAX_AGE,
+                 ydl_class=yt_dlp.YoutubeDL):
+        self._opts = opts
+        self._ydl_class = ydl_class
+        self._size = size
+        self._max_uses = max_uses
+        self._max_age = max_age
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.recycled = 0
+
+    @contextmanager
+    def acquire(self):
+        """
+        Checks out a YoutubeDL for exclusive use, blocking while all
+        instances are busy.
+        """
+        with timing.stage('ydl'):
+            item = self._checkout()
+        try:
+            yield item.ydl
+        except yt_dlp.utils.DownloadError:
+            self._checkin(item)
+            raise
+        except BaseException:
+            # Unknown failure, the instance may be in a half-updated state
+            self._discard(item)
+            raise
+        else:
+            self._checkin(item)
+
+    def _checkout(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_create = self._created < self._size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return _PooledYDL(self._opts, self._ydl_class)
+                except BaseException:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            # Pool exhausted: wait for a checkin, re-checking periodically in
+            # case a discarded instance freed up room to build a new one
+            try:
+                return self._idle.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _checkin(self, item):
+        item.uses += 1
+        if item.uses >= self._max_uses or time.monotonic() - item.created_at >= self._max_age:
+            self.recycled += 1
+            self._discard(item)
+            return
+        self._reset(item.ydl)
+        self._idle.put(item)
+
+    def _discard(self, item):
+        try:
+            item.ydl.close()
+        except Exception as e:
+            logging.warning(f"Failed to close pooled YoutubeDL: {e}")
+        with self._lock:
+            self._created -= 1
+
+    @staticmethod
+    def _reset(ydl):
+        # Per-extraction bookkeeping that would otherwise leak into the next request
+        ydl._num_downloads = 0
+        ydl._num_videos = 0
+        ydl._download_retcode = 0
+        ydl._playlist_level = 0
+        ydl._playlist_urls.clear()
+        ydl._printed_messages.clear()
+        ydl.cookiejar.clear()
+
+    def stats(self):
+        return {
+            'size': self._size,
+            'created': self._created,
+            'idle': self._idle.qsize(),
+            'recycled': self.recycled,
+        }